@@ -1,34 +1,119 @@
 """Zero Configuration DLNA Server - A simple DLNA media server."""
 
 import hashlib
+import json
 import os
 import socket
 import threading
 import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from http.server import ThreadingHTTPServer
 import argparse
+import errno
+import functools
 
 try:  # Hacky but needed to support both package and module imports
     from .constants import (
-        SERVER_NAME,
         SERVER_DESCRIPTION,
         SERVER_VERSION,
         SERVER_MANUFACTURER,
+        get_default_server_name,
+        get_media_mime_type,
+        is_ignored_dir,
         is_supported_media_file,
     )
     from .dlna import DLNAHandler
+    from .helpers import build_device_description, create_directory_mapping
     from .ssdp import SSDPServer
 except ImportError:
     from constants import (
-        SERVER_NAME,
         SERVER_DESCRIPTION,
         SERVER_VERSION,
         SERVER_MANUFACTURER,
+        get_default_server_name,
+        get_media_mime_type,
+        is_ignored_dir,
         is_supported_media_file,
     )
     from dlna import DLNAHandler
+    from helpers import build_device_description, create_directory_mapping
     from ssdp import SSDPServer
 
+# Seconds between background checks for media directory changes
+RESCAN_INTERVAL = 30
+
+# A directory modified more recently than this (in ns) may change again
+# without its mtime moving on coarse-mtime filesystems (FAT/exFAT/SMB), so
+# results for it are not reused until it has settled
+MTIME_SETTLE_NS = 2_000_000_000
+
+# Recorded in place of an mtime for a directory that could not be listed, by
+# both the full scan and the mtime walk, so the two agree on it until it
+# becomes readable again
+UNLISTABLE_MTIME = -1
+
+# Bump when the layout of the on-disk scan cache or the content hash changes
+SCAN_CACHE_VERSION = 2
+
+# Fixed leading groups of the device UUID; the rest comes from the hashes
+UUID_PREFIX = "65da942e-1984-3309-"
+
+
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that runs at most max_threads handler threads.
+    When all are busy the accept loop waits for one to finish, and new
+    connections queue in the listen backlog meanwhile.
+    """
+
+    def __init__(
+        self, server_address, handler_class, max_threads, bind_and_activate=True
+    ):
+        self._thread_slots = threading.BoundedSemaphore(max_threads)
+        # Set by shutdown() so a request waiting for a slot gives up
+        self._shutting_down = threading.Event()
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    def shutdown(self):
+        """Stop serve_forever, closing any request still waiting for a slot"""
+        self._shutting_down.set()
+        super().shutdown()
+
+    def process_request(self, request, client_address):
+        """
+        Wait for a free slot, then handle the request on a new thread.
+        The wait is polled so busy handlers (e.g. idle keep-alive
+        connections) can't hold up shutdown(); a request still waiting
+        for a slot at shutdown is closed instead.
+        """
+        # pylint: disable-next=consider-using-with
+        while not self._thread_slots.acquire(timeout=0.5):
+            if self._shutting_down.is_set():
+                self.shutdown_request(request)
+                return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._thread_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        """Handle the request, then free its slot"""
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._thread_slots.release()
+
+
+def _short_hash(data, size):
+    """
+    Return a hex digest of exactly size bytes of data.
+    BLAKE2b produces the requested length directly, so there is no need to
+    hash with MD5 and truncate. None of these hashes are security relevant.
+    """
+    return hashlib.blake2b(data, digest_size=size).hexdigest()
+
 
 class ZeroConfigDLNA:
     """
@@ -38,35 +123,78 @@ class ZeroConfigDLNA:
     Serves media files from a specified directory to DLNA-compatible devices.
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         media_directory=None,
         port=8200,
         verbose=False,
         server_name=None,
         fast=False,
+        scan_workers=16,
+        one_file_system=False,
+        http_threads=64,
     ):
-        self.server_name = server_name
+        self.server_name = server_name or get_default_server_name()
         self.version = SERVER_VERSION
         self.author = SERVER_MANUFACTURER
         self.description = SERVER_DESCRIPTION
-        self.media_directory = media_directory or os.getcwd()
+        # Normalise once so nothing downstream needs to call abspath again
+        self.media_directory = os.path.abspath(media_directory or os.getcwd())
+        # Length of the "dir/" prefix, so scans can derive relative paths by
+        # slicing instead of os.path.relpath
+        self._media_dir_prefix_len = len(os.path.join(self.media_directory, ""))
+        # Device of the media directory, for skipping mount points when scanning
+        try:
+            self._media_dev = os.stat(self.media_directory).st_dev
+        except OSError:
+            self._media_dev = None
         self.port = port
         self.server = None
         self.server_thread = None
         self.verbose = verbose
         self.fast = fast
-        socket.setdefaulttimeout(60)  # 60 seconds timeout
-
-        # Generate UUID based on directory content hash
-        # This forces client cache refresh only when content actually changes
-        self.device_uuid = self._generate_content_hash_uuid()
-        self.server_ip = self.get_local_ip()
-        self.running = False
+        self.scan_workers = scan_workers
+        self.one_file_system = one_file_system
+        self.http_threads = http_threads
 
         # Track directory content hash to detect changes
         self._content_hash = None
         self._last_hash_check = 0
+        # Held while checking for changes so concurrent requests don't rescan
+        self._hash_lock = threading.Lock()
+        # Directory mtimes from the last full scan, used to skip rescans
+        self._dir_mtimes = {}
+        # Per-directory scan results from the last scan, keyed by path
+        self._dir_digests = {}
+        # Browse listings keyed by directory path: (dir mtime_ns, entries)
+        self._listing_cache = {}
+        # Held while a listing is rebuilt so concurrent Browse requests for
+        # the same directory scan it once
+        self._listing_lock = threading.Lock()
+        # Object ID <-> path mapping shared by Browse requests, as
+        # (SystemUpdateID it was built for, mapping)
+        self._directory_mapping = None
+        self._mapping_lock = threading.Lock()
+        # The media directory never changes, so hash its path once
+        self._path_hash = _short_hash(os.fsencode(self.media_directory), 2)
+
+        # Count media files and hash the tree in the background so a large
+        # library doesn't block construction; device_uuid waits for it
+        self.media_count = 0
+        self._device_uuid = None
+        self._scan_ready = threading.Event()
+        threading.Thread(target=self._bootstrap_scan, daemon=True).start()
+        # Timer that periodically checks for content changes while running
+        self._rescan_timer = None
+        # Set by stop() to wake run()
+        self._stop_event = threading.Event()
+        # ((device_uuid, port), xml bytes) for the last rendered description
+        self._device_description = None
+
+        self.server_ip = self.get_local_ip()
+        # "http://ip:port" once the HTTP server is bound, set by start()
+        self.base_url = None
+        self.running = False
 
         # Simple counter that increments on root folder access to force refresh
         self._system_update_id = (
@@ -77,10 +205,49 @@ class ZeroConfigDLNA:
         self.now_playing = None  # Track currently playing media
         self.now_playing_timestamp = None  # Track when media was last accessed
 
+    @property
+    def device_uuid(self):
+        """Device UUID, waiting for the initial content scan if needed."""
+        self._scan_ready.wait()
+        return self._device_uuid
+
+    @device_uuid.setter
+    def device_uuid(self, value):
+        self._device_uuid = value
+
+    def _bootstrap_scan(self):
+        """Run the initial content scan and generate the device UUID."""
+        try:
+            with self._hash_lock:
+                # Seed the per-directory cache from the last run so unchanged
+                # directories only need a stat() rather than a full listing
+                self._load_scan_cache()
+                # Count media files and hash the tree in a single pass
+                self.media_count, content_hash = self._scan_once()
+                self._save_scan_cache()
+                # Generate UUID based on directory content hash
+                # This forces client cache refresh only when content actually changes
+                self._device_uuid = self._generate_content_hash_uuid(content_hash)
+        finally:
+            self._scan_ready.set()
+
+    def get_device_description(self):
+        """
+        Get the UPnP device description XML as UTF-8 bytes.
+        Rendered once and reused until the device UUID or port changes.
+        """
+        device_uuid = self.device_uuid
+        cached = self._device_description
+        if cached is None or cached[0] != (device_uuid, self.port):
+            cached = (
+                (device_uuid, self.port),
+                build_device_description(self, device_uuid).encode("utf-8"),
+            )
+            self._device_description = cached
+        return cached[1]
+
     def get_now_playing(self):
         """Get the currently playing media file from the server."""
-        import time
-
         if self.now_playing:
             time_since_access = None
             if self.now_playing_timestamp:
@@ -103,8 +270,6 @@ class ZeroConfigDLNA:
 
     def set_now_playing(self, filename):
         """Set the currently playing media file."""
-        import time
-
         self.now_playing = filename
         self.now_playing_timestamp = time.time()
         if self.verbose:
@@ -117,30 +282,50 @@ class ZeroConfigDLNA:
         self.now_playing = None
         self.now_playing_timestamp = None
 
-    def find_a_port(self):
-        """Find an available port starting from the specified port"""
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        test_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        port = self.port
-        while True:
-            try:
-                test_socket.bind((self.server_ip, port))
-                test_socket.close()
-                return port
-            except OSError:
-                if self.verbose:
-                    print(f"Port {port} is in use, trying next port...")
-                port += 1
-
-    def get_local_ip(self):
-        """Get the local IP address"""
+    def bind_server(self, server):
+        """
+        Bind and activate the HTTP server's socket, preferring self.port.
+        If the port is in use, a fresh socket is bound to port 0 so the
+        kernel picks a free port. Binding the server's own socket avoids
+        probing with a throwaway socket and then binding a second time.
+        """
+        try:
+            server.server_bind()
+        except OSError as e:
+            # Only a busy or privileged port is worth retrying elsewhere;
+            # anything else (e.g. the IP is not on this host) is a real error
+            if e.errno not in (errno.EADDRINUSE, errno.EACCES):
+                raise
+            print(f"Port {self.port} is unavailable, using a free port instead")
+            server.socket.close()
+            server.socket = socket.socket(server.address_family, server.socket_type)
+            server.server_address = (self.server_ip, 0)
+            server.server_bind()
+        server.server_activate()
+        return server.server_address[1]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def get_local_ip():
+        """Get the local IP address (cached after the first lookup)"""
         try:
             # Connect to a remote address to determine local IP
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.settimeout(2)
                 s.connect(("8.8.8.8", 80))
                 return s.getsockname()[0]
         except Exception:
-            return "127.0.0.1"
+            pass
+        # No route out (e.g. an air-gapped LAN), so ask the resolver instead
+        try:
+            for info in socket.getaddrinfo(
+                socket.gethostname(), None, socket.AF_INET, socket.SOCK_DGRAM
+            ):
+                if not info[4][0].startswith("127."):
+                    return info[4][0]
+        except OSError:
+            pass
+        return "127.0.0.1"
 
     def create_handler(self):
         """
@@ -161,9 +346,12 @@ class ZeroConfigDLNA:
     def start(self):
         """Start the DLNA server"""
         try:
-            print(f"{self.server_name} v{self.version} is starting...")
-            print(f"Media directory: {os.path.abspath(self.media_directory)}")
-            print(f"Server IP: {self.server_ip}")
+            # Banner lines are joined so each block is a single write
+            print(
+                f"{self.server_name} v{self.version} is starting...\n"
+                f"Media directory: {self.media_directory}\n"
+                f"Server IP: {self.server_ip}"
+            )
 
             if not os.path.exists(self.media_directory):
                 print(
@@ -171,31 +359,22 @@ class ZeroConfigDLNA:
                 )
                 return False
 
-            # Find an available port starting from the specified port
-            self.port = self.find_a_port()
-            print(f"Port: {self.port}")
-
-            # Count media files
-            media_count = 0
-
-            def count_media_files(directory):
-                nonlocal media_count
-                for item in os.listdir(directory):
-                    item_path = os.path.join(directory, item)
-                    if os.path.isfile(item_path):
-                        if is_supported_media_file(item_path):
-                            media_count += 1
-                    elif os.path.isdir(item_path):
-                        # Recursively count files in subdirectories
-                        count_media_files(item_path)
-
-            count_media_files(self.media_directory)
-            print(f"Found {media_count} media files to serve")
-
-            # Use ThreadingHTTPServer to handle concurrent requests
-            self.server = ThreadingHTTPServer(
-                (self.server_ip, self.port), self.create_handler()
+            # Handle concurrent requests on a bounded number of threads
+            self.server = BoundedThreadingHTTPServer(
+                (self.server_ip, self.port),
+                self.create_handler(),
+                self.http_threads,
+                bind_and_activate=False,
             )
+            # Allow a larger backlog for bursts of connections after discovery
+            self.server.request_queue_size = 128
+            # Use the specified port, or any free port if it is taken
+            self.port = self.bind_server(self.server)
+            self.base_url = f"http://{self.server_ip}:{self.port}"
+
+            # Media files were counted during the initial content scan
+            self._scan_ready.wait()
+
             # Set server-side timeout to ensure we don't block forever on client operations
             self.server.timeout = (
                 7200  # Very long timeout for media streaming / pausing etc
@@ -205,16 +384,22 @@ class ZeroConfigDLNA:
             self.server_thread.start()
 
             self.running = True
-            print(f"DLNA Server running at http://{self.server_ip}:{self.port}/")
+            self._stop_event.clear()
             print(
-                f"Device description: http://{self.server_ip}:{self.port}/description.xml"
+                f"Port: {self.port}\n"
+                f"Found {self.media_count} media files to serve\n"
+                f"DLNA Server running at {self.base_url}/\n"
+                f"Device description: {self.base_url}/description.xml\n"
+                f"Browse media: {self.base_url}/browse\n"
+                "Press Ctrl+C to stop the server"
             )
-            print(f"Browse media: http://{self.server_ip}:{self.port}/browse")
-            print("Press Ctrl+C to stop the server")
 
             # Start SSDP server for UPnP discovery
             self.ssdp_server.start()
 
+            # Watch for content changes in the background
+            self._schedule_rescan()
+
             return True
 
         except Exception as e:
@@ -225,6 +410,9 @@ class ZeroConfigDLNA:
         """Stop the DLNA server"""
         print(f"{self.server_name} is stopping...")
         self.running = False
+        self._stop_event.set()
+        if self._rescan_timer:
+            self._rescan_timer.cancel()
         if self.server:
             self.server.shutdown()
             self.server.server_close()
@@ -238,8 +426,12 @@ class ZeroConfigDLNA:
         """Run the server and handle keyboard interrupt"""
         if self.start():
             try:
-                while self.running:
-                    time.sleep(1)
+                # Block until stop() instead of polling. Windows can't
+                # interrupt a blocking wait with Ctrl+C, so wake there
+                # periodically to let KeyboardInterrupt through.
+                timeout = 1 if os.name == "nt" else None
+                while not self._stop_event.wait(timeout):
+                    pass
             except KeyboardInterrupt:
                 pass
             finally:
@@ -248,78 +440,323 @@ class ZeroConfigDLNA:
     def refresh_cache_on_root_access(self):
         """
         Increment SystemUpdateID when clients access the root media folder.
-        Also check if content has changed and update UUID if needed.
+        Content changes are detected separately by the background rescan.
         """
         self._system_update_id += 1
 
-        # Check if content has changed and update UUID if needed
-        content_changed = self.has_content_changed()
-
         if self.verbose:
             print(
                 f"Root folder accessed - refreshed SystemUpdateID to {self._system_update_id}"
             )
-            if content_changed:
-                print("Content change detected - UUID updated")
+
+    def _schedule_rescan(self):
+        """Arm the timer for the next background content check."""
+        self._rescan_timer = threading.Timer(RESCAN_INTERVAL, self._periodic_rescan)
+        self._rescan_timer.daemon = True
+        self._rescan_timer.start()
+
+    def _periodic_rescan(self):
+        """
+        Check if content has changed and update UUID if needed, then re-arm.
+        Runs on a timer so root folder requests never wait on a rescan.
+        """
+        if not self.running:
+            return
+
+        try:
+            if self.has_content_changed():
+                self._system_update_id += 1
+                if self.verbose:
+                    print("Content change detected - UUID updated")
+        finally:
+            # Re-arm even if the check failed, or change detection would stop
+            # for the rest of the run
+            self._schedule_rescan()
 
     def get_system_update_id(self):
         """Get the current system update ID."""
         return self._system_update_id
 
-    def _get_directory_content_hash(self):
+    def get_directory_mapping(self):
         """
-        Generate a hash of all directory contents (files and subdirectories).
-        This changes when files are added, removed, renamed, or modified.
+        Get the object ID <-> relative path mapping for the media tree.
+        The tree is walked once per SystemUpdateID rather than on every
+        Browse; the ID moves on content changes and root folder access.
         """
+        update_id = self._system_update_id
+        with self._mapping_lock:
+            cached = self._directory_mapping
+            if cached is None or cached[0] != update_id:
+                cached = (update_id, create_directory_mapping(self.media_directory))
+                self._directory_mapping = cached
+            return cached[1]
+
+    def _get_scan_cache_path(self):
+        """Get the path of the on-disk scan cache for this media directory."""
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        key = _short_hash(os.fsencode(self.media_directory), 16)
+        return os.path.join(cache_home, "zeroconfigdlna", f"{key}.json")
+
+    def _load_scan_cache(self):
+        """
+        Load per-directory scan results saved by a previous run.
+        A missing, unreadable or outdated cache is ignored.
+        """
+        try:
+            with open(self._get_scan_cache_path(), "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            # Cached subdirectory lists depend on which directories are scanned
+            if (
+                cache.get("version") != SCAN_CACHE_VERSION
+                or cache.get("one_file_system") != self.one_file_system
+            ):
+                return
+            self._dir_digests = {
+                path: (mtime, bytes.fromhex(digest), count, subdirs)
+                for path, (mtime, digest, count, subdirs) in cache["dirs"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            if self.verbose:
+                print(f"Not using scan cache: {e}")
+
+    def _save_scan_cache(self):
+        """
+        Save per-directory scan results so the next run can skip listing
+        directories that have not changed. Written atomically via os.replace.
+        """
+        cache_path = self._get_scan_cache_path()
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
         try:
-            content_items = []
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": SCAN_CACHE_VERSION,
+                        "one_file_system": self.one_file_system,
+                        "dirs": {
+                            path: (mtime, digest.hex(), count, subdirs)
+                            for path, (
+                                mtime,
+                                digest,
+                                count,
+                                subdirs,
+                            ) in self._dir_digests.items()
+                        },
+                    },
+                    f,
+                )
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            if self.verbose:
+                print(f"Could not save scan cache: {e}")
 
-            for root, dirs, files in os.walk(self.media_directory):
-                # Sort for consistent ordering
-                dirs.sort()
-                files.sort()
+    def _is_scannable_dir(self, entry):
+        """
+        Check whether a DirEntry is a directory the content scans descend into.
+        Symlinked directories are never followed, which also rules out
+        symlink loops. Hidden directories and well-known system/tooling
+        directories (IGNORED_DIRS) are pruned without being listed. With
+        one_file_system set, directories on another device (mount points
+        such as network shares) are skipped as well.
+        """
+        if is_ignored_dir(entry.name):
+            return False
+        if not entry.is_dir(follow_symlinks=False):
+            return False
+        if self.one_file_system:
+            return entry.stat(follow_symlinks=False).st_dev == self._media_dev
+        return True
 
-                for file in files:
-                    file_path = os.path.join(root, file)
+    def _get_directory_mtimes(self):
+        """
+        Collect the mtime of every directory in the media tree.
+        Only directories are stat'd, so this is much cheaper than a full
+        content scan on libraries with many files per directory. Directories
+        that cannot be listed are recorded as UNLISTABLE_MTIME.
+        """
+        dir_mtimes = {}
+        try:
+            dir_mtimes[self.media_directory] = os.stat(
+                self.media_directory
+            ).st_mtime_ns
+        except OSError:
+            return dir_mtimes
+
+        # Subtrees are listed on a thread pool, as in the full content scan,
+        # since stat latency dominates on network shares
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            pending = {
+                executor.submit(
+                    self._list_subdir_mtimes, self.media_directory
+                ): self.media_directory
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
                     try:
-                        # Get relative path for portability
-                        rel_path = os.path.relpath(file_path, self.media_directory)
-                        stat_info = os.stat(file_path)
-                        # Include path, size, and modification time
-                        content_items.append(
-                            f"{rel_path}:{stat_info.st_size}:{int(stat_info.st_mtime)}"
-                        )
+                        subdir_mtimes = future.result()
                     except OSError:
+                        dir_mtimes[path] = UNLISTABLE_MTIME
                         continue
+                    for subdir, mtime in subdir_mtimes:
+                        dir_mtimes[subdir] = mtime
+                        pending[
+                            executor.submit(self._list_subdir_mtimes, subdir)
+                        ] = subdir
+        return dir_mtimes
+
+    def _list_subdir_mtimes(self, path):
+        """Return (path, mtime) pairs for the scannable subdirectories of path."""
+        with os.scandir(path) as it:
+            return [
+                (entry.path, entry.stat(follow_symlinks=False).st_mtime_ns)
+                for entry in it
+                if self._is_scannable_dir(entry)
+            ]
+
+    def _scan_directory(self, path):
+        """
+        Scan a single directory for the parallel content scan.
+
+        Returns a tuple of (mtime_ns, digest, media_count, subdirs) for the
+        directory. The digest covers the sorted (rel_path, size, mtime)
+        records of its files. If the directory's mtime matches the previous
+        scan, the cached result is reused without listing it again. A
+        directory that has not settled (see MTIME_SETTLE_NS) is recorded
+        with an mtime of None so it is always listed again next time.
+        Symlinked directories are not followed.
+        """
+        dir_mtime = os.stat(path).st_mtime_ns
+        cached = self._dir_digests.get(path)
+        if cached is not None and cached[0] == dir_mtime:
+            return cached
+        if time.time_ns() - dir_mtime <= MTIME_SETTLE_NS:
+            dir_mtime = None
+
+        files = []
+        subdirs = []
+        # Local bindings for the per-entry loop
+        add_file = files.append
+        prefix_len = self._media_dir_prefix_len
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if self._is_scannable_dir(entry):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        stat_info = entry.stat()
+                        add_file(
+                            (
+                                # Relative path for portability
+                                entry.path[prefix_len:],
+                                stat_info.st_size,
+                                int(stat_info.st_mtime),
+                            )
+                        )
+                except OSError:
+                    continue
 
-            # Create hash from all content info
-            content_string = "\n".join(content_items)
-            return hashlib.md5(content_string.encode()).hexdigest()[:12]
+        files.sort()
+        media_count = sum(
+            1 for rel_path, _, _ in files if is_supported_media_file(rel_path)
+        )
+
+        hasher = hashlib.blake2b(digest_size=16)
+        if files:
+            # Hash each column in one call so the per-file serialisation
+            # happens in C (str.join, array.tobytes) rather than in Python
+            rel_paths, sizes, mtimes = zip(*files)
+            hasher.update("\0".join(rel_paths).encode("utf-8", "surrogateescape"))
+            hasher.update(array("q", sizes).tobytes())
+            hasher.update(array("q", mtimes).tobytes())
+
+        return dir_mtime, hasher.digest(), media_count, subdirs
+
+    def _scan_once(self):
+        """
+        Walk the media tree once, counting media files and hashing contents.
+        Returns a tuple of (media_count, content_hash). The hash covers each
+        file's name, size and mtime, so it changes when files are added,
+        removed or renamed. Directories whose mtime has not moved are not
+        listed again, so a file edited in place (which leaves its directory's
+        mtime alone) is only picked up once something else in that directory
+        changes; that is the price of not stat'ing every file on each rescan.
+
+        Each directory gets its own digest and the content hash is taken over
+        the sorted per-directory digests, so on a rescan only directories
+        whose mtime changed need to be listed again. Directories are scanned
+        concurrently on a thread pool since the work is dominated by blocking
+        scandir/stat calls that release the GIL.
+        """
+        try:
+            dir_digests = {}
+            unlistable = []
+
+            with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+                pending = {
+                    executor.submit(
+                        self._scan_directory, self.media_directory
+                    ): self.media_directory
+                }
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path = pending.pop(future)
+                        try:
+                            dir_digests[path] = result = future.result()
+                        except OSError:
+                            unlistable.append(path)
+                            continue
+                        for subdir in result[3]:
+                            pending[
+                                executor.submit(self._scan_directory, subdir)
+                            ] = subdir
+
+            hasher = hashlib.blake2b(digest_size=6)
+            for path in sorted(dir_digests):
+                hasher.update(
+                    path[self._media_dir_prefix_len :].encode(
+                        "utf-8", "surrogateescape"
+                    )
+                )
+                hasher.update(b"\0")
+                hasher.update(dir_digests[path][1])
+
+            self._dir_digests = dir_digests
+            self._dir_mtimes = {
+                path: result[0] for path, result in dir_digests.items()
+            }
+            # Without these, an unreadable directory would never match the
+            # mtime walk and every check would fall through to a full scan
+            self._dir_mtimes.update(dict.fromkeys(unlistable, UNLISTABLE_MTIME))
+            media_count = sum(result[2] for result in dir_digests.values())
+
+            return media_count, hasher.hexdigest()
 
         except Exception as e:
             if self.verbose:
                 print(f"Error calculating content hash: {e}")
             # Fallback to timestamp
-            return hashlib.md5(str(int(time.time())).encode()).hexdigest()[:12]
+            return 0, _short_hash(str(int(time.time())).encode(), 6)
 
-    def _generate_content_hash_uuid(self):
+    def _generate_content_hash_uuid(self, content_hash=None):
         """
         Generate a UUID that changes only when directory content changes.
         Much more efficient than time-based refresh.
+        Pass content_hash if the tree has already been scanned.
         """
-        # Directory path for basic stability
-        path_hash = hashlib.md5(
-            os.path.abspath(self.media_directory).encode()
-        ).hexdigest()[:8]
-
         # Content hash that changes when files change
-        content_hash = self._get_directory_content_hash()
+        if content_hash is None:
+            self.media_count, content_hash = self._scan_once()
 
         # Store the content hash for later comparison
         self._content_hash = content_hash
 
         uuid_string = (
-            f"65da942e-1984-3309-{content_hash[:4]}-{content_hash[4:8]}{path_hash[:4]}"
+            f"{UUID_PREFIX}{content_hash[:4]}-{content_hash[4:8]}{self._path_hash}"
         )
 
         if self.verbose:
@@ -333,27 +770,94 @@ class ZeroConfigDLNA:
         Check if directory content has changed since last check.
         Only recalculates hash every 30 seconds to avoid excessive disk I/O.
         """
-        current_time = time.time()
-
-        # Don't check too frequently to avoid performance issues
-        if current_time - self._last_hash_check < 30:
+        # Another request is already checking, so don't start a second scan
+        if not self._hash_lock.acquire(  # pylint: disable=consider-using-with
+            blocking=False
+        ):
             return False
 
-        self._last_hash_check = current_time
-        current_hash = self._get_directory_content_hash()
+        try:
+            current_time = time.monotonic()
 
-        if current_hash != self._content_hash:
-            if self.verbose:
-                print(f"Content changed: {self._content_hash} -> {current_hash}")
-            self._content_hash = current_hash
-            # Regenerate UUID with new content hash
-            old_uuid = self.device_uuid
-            self.device_uuid = self._generate_content_hash_uuid()
-            if self.verbose:
-                print(f"UUID updated: {old_uuid} -> {self.device_uuid}")
-            return True
+            # Don't check too frequently to avoid performance issues
+            if current_time - self._last_hash_check < RESCAN_INTERVAL:
+                return False
+
+            self._last_hash_check = current_time
+
+            # Adding, removing or renaming entries updates the parent directory's
+            # mtime, so if no directory mtime moved there is nothing to rehash.
+            # Directories that had not settled at the last scan are recorded
+            # as None and so always force a rescan.
+            if self._dir_mtimes and self._get_directory_mtimes() == self._dir_mtimes:
+                return False
+
+            media_count, current_hash = self._scan_once()
+            self.media_count = media_count
+            self._save_scan_cache()
 
-        return False
+            if current_hash != self._content_hash:
+                if self.verbose:
+                    print(f"Content changed: {self._content_hash} -> {current_hash}")
+                self._content_hash = current_hash
+                # Regenerate UUID with new content hash
+                old_uuid = self.device_uuid
+                self.device_uuid = self._generate_content_hash_uuid(current_hash)
+                if self.verbose:
+                    print(f"UUID updated: {old_uuid} -> {self.device_uuid}")
+                return True
+
+            return False
+        finally:
+            self._hash_lock.release()
+
+    def list_directory(self, dir_path):
+        """
+        List dir_path for browsing as (name, is_dir, mime_type, size) tuples
+        in directory order. Files that are not media and hidden or ignored
+        directories are left out.
+        The result is reused until the directory's mtime changes.
+        """
+        dir_mtime = os.stat(dir_path).st_mtime_ns
+        cached = self._listing_cache.get(dir_path)
+        if cached is not None and cached[0] == dir_mtime:
+            return cached[1]
+
+        with self._listing_lock:
+            # Another thread may have listed it while we waited
+            cached = self._listing_cache.get(dir_path)
+            if cached is not None and cached[0] == dir_mtime:
+                return cached[1]
+            return self._scan_listing(dir_path, dir_mtime)
+
+    def _scan_listing(self, dir_path, dir_mtime):
+        """Scan dir_path for list_directory and cache it if it has settled"""
+        entries = []
+        # scandir gives the entry type from the directory read itself, so
+        # only media files need a stat() (for their size)
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        # Hidden and ignored directories are not scanned,
+                        # so they are not offered for browsing either
+                        if not is_ignored_dir(entry.name):
+                            entries.append((entry.name, True, None, 0))
+                    elif entry.is_file():
+                        mime_type = get_media_mime_type(entry.name)
+                        if mime_type:
+                            entries.append(
+                                (entry.name, False, mime_type, entry.stat().st_size)
+                            )
+                except OSError:
+                    # Vanished or unreadable entry (e.g. a dangling symlink)
+                    continue
+        entries = tuple(entries)
+
+        # Only cache listings of directories that have settled
+        if time.time_ns() - dir_mtime > MTIME_SETTLE_NS:
+            self._listing_cache[dir_path] = (dir_mtime, entries)
+        return entries
 
     def get_media_info(self, filename=None):
         """Get detailed information about currently playing or specified media."""
@@ -403,7 +907,7 @@ def main():
     parser.add_argument(
         "-n",
         "--server_name",
-        default=SERVER_NAME,
+        default=None,
         help="Set the DLNA server name (default: ZeroConfigDLNA_<hostname> or value from DLNA_HOSTNAME env var)",
     )
     parser.add_argument(
@@ -413,6 +917,27 @@ def main():
         help="Disable ffprobe and mediainfo subprocess calls for faster operation and wider compatibility",
     )
 
+    parser.add_argument(
+        "-w",
+        "--scan-workers",
+        type=int,
+        default=16,
+        help="Number of threads used to scan the media directory (default: 16, around 4 suits spinning disks)",
+    )
+    parser.add_argument(
+        "-x",
+        "--one-file-system",
+        action="store_true",
+        help="Don't descend into directories on other filesystems (e.g. mounted network shares) when scanning",
+    )
+    parser.add_argument(
+        "-t",
+        "--http-threads",
+        type=int,
+        default=64,
+        help="Maximum number of concurrent HTTP connections to handle (default: 64)",
+    )
+
     args = parser.parse_args()
 
     server = ZeroConfigDLNA(
@@ -421,6 +946,9 @@ def main():
         verbose=args.verbose,
         server_name=args.server_name,
         fast=args.fast,
+        scan_workers=args.scan_workers,
+        one_file_system=args.one_file_system,
+        http_threads=args.http_threads,
     )
     server.run()
 
@@ -4,24 +4,77 @@ This module contains configuration constants including server information,
 hostname handling, and version details for the DLNA server.
 """
 
+import functools
 import os
 import socket
 try:
-    from .custom_mimetypes import CustomMimeTypes
+    from .custom_mimetypes import mime_types as custom_mimetypes
 except ImportError:
-    from custom_mimetypes import CustomMimeTypes
+    from custom_mimetypes import mime_types as custom_mimetypes
 
-# Get hostname, truncate at first dot, then limit to 16 chars max
-hostname = socket.gethostname().split(".")[0][:16]
-
-SERVER_NAME = os.environ.get("DLNA_HOSTNAME") or f"ZeroConfigDLNA_{hostname}"
 SERVER_DESCRIPTION = "ZeroConfigDLNA Server"
 SERVER_VERSION = "1.1.28"
 SERVER_MANUFACTURER = "richstokes"
 SERVER_AGENT = f"ZeroConfigDLNA/{SERVER_VERSION} DLNA/1.50 UPnP/1.0"
 
-# Create a global instance of CustomMimeTypes
-custom_mimetypes = CustomMimeTypes()
+
+@functools.lru_cache(maxsize=None)
+def get_default_server_name():
+    """
+    Get the default DLNA server name, resolved on first use rather than
+    at import.
+
+    Returns:
+        str: DLNA_HOSTNAME if set, otherwise ZeroConfigDLNA_<hostname> with
+            the hostname truncated at the first dot and to 16 characters
+    """
+    server_name = os.environ.get("DLNA_HOSTNAME")
+    if server_name:
+        return server_name
+    try:
+        hostname = socket.gethostname().split(".")[0][:16]
+    except OSError:
+        hostname = "host"
+    return f"ZeroConfigDLNA_{hostname}"
+
+
+def _exts_for_mime_prefix(prefix):
+    """Return the extensions whose MIME type starts with prefix."""
+    return frozenset(
+        ext
+        for ext, mime_type in custom_mimetypes.types_map.items()
+        if mime_type.startswith(prefix)
+    )
+
+
+# Extensions by media category, precomputed so the per-file check is a
+# single set lookup rather than a MIME type guess
+VIDEO_EXTS = _exts_for_mime_prefix("video/")
+AUDIO_EXTS = _exts_for_mime_prefix("audio/")
+IMAGE_EXTS = _exts_for_mime_prefix("image/")
+MEDIA_EXTS = VIDEO_EXTS | AUDIO_EXTS | IMAGE_EXTS
+
+# Directories that are neither scanned nor browsed (hidden directories,
+# those starting with ".", are skipped as well)
+IGNORED_DIRS = frozenset(
+    (
+        "$RECYCLE.BIN",
+        "System Volume Information",
+        "node_modules",
+        "__pycache__",
+        "@eaDir",
+        "#recycle",
+    )
+)
+
+
+def is_ignored_dir(name):
+    """
+    Check if a directory name is hidden or in IGNORED_DIRS. The content
+    scans, Browse listings and the object ID mapping all use this so they
+    agree on which directories exist.
+    """
+    return name.startswith(".") or name in IGNORED_DIRS
 
 
 def is_supported_media_file(file_path):
@@ -34,9 +87,33 @@ def is_supported_media_file(file_path):
     Returns:
         bool: True if the file is a supported media type, False otherwise
     """
-    mime_type, _ = custom_mimetypes.guess_type(file_path)
-    return mime_type and (
-        mime_type.startswith("video/")
-        or mime_type.startswith("audio/")
-        or mime_type.startswith("image/")
-    )
+    return os.path.splitext(file_path)[1].lower() in MEDIA_EXTS
+
+
+def get_mime_type(file_path):
+    """
+    Get the MIME type of any file from its extension.
+
+    Args:
+        file_path: Path to the file to check
+
+    Returns:
+        str: The MIME type, or None if the extension is unknown
+    """
+    return custom_mimetypes.types_map.get(os.path.splitext(file_path)[1].lower())
+
+
+def get_media_mime_type(file_path):
+    """
+    Get the MIME type of a supported media file (video, audio, or image).
+
+    Args:
+        file_path: Path to the file to check
+
+    Returns:
+        str: The MIME type, or None if the file is not a supported media type
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in MEDIA_EXTS:
+        return custom_mimetypes.types_map[ext]
+    return None
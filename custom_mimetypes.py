@@ -9,6 +9,32 @@ import re
 from typing import Dict, List, Optional, Tuple
 
 
+# Fallback types used when the mime.types file can't be loaded
+BASIC_TYPES: Dict[str, str] = {
+    # Common video formats
+    ".mp4": "video/mp4",
+    ".mkv": "video/x-matroska",
+    ".avi": "video/x-msvideo",
+    ".mov": "video/quicktime",
+    ".wmv": "video/x-ms-wmv",
+    ".flv": "video/x-flv",
+    ".webm": "video/webm",
+    # Common audio formats
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+    ".aac": "audio/aac",
+    ".flac": "audio/flac",
+    # Common image formats
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".webp": "image/webp",
+}
+
+
 class CustomMimeTypes:
     """
     A custom implementation of the mimetypes module that reads from
@@ -41,30 +67,30 @@ class CustomMimeTypes:
             mime_file_path: Path to the mime.types file.
         """
         try:
+            # Read and lowercase the whole file in one go rather than per token
             with open(mime_file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    # Skip comments and empty lines
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-
-                    # Parse the line: mime_type extension [extension ...]
-                    parts = line.split()
-                    if len(parts) < 2:
-                        continue
-
-                    mime_type = parts[0].lower()
-                    for ext in parts[1:]:
-                        ext = ext.lower()
-                        if not ext.startswith("."):
-                            ext = "." + ext
-
-                        # Map extension to MIME type
-                        self.types_map[ext] = mime_type
-
-                        # Map MIME type to first extension for that type
-                        if mime_type not in self.extensions_map:
-                            self.extensions_map[mime_type] = ext
+                data = f.read().lower()
+
+            types_map: Dict[str, str] = {}
+            extensions_map: Dict[str, str] = {}
+            for line in data.splitlines():
+                # Parse the line: mime_type extension [extension ...]
+                parts = line.split()
+                # Skip comments, empty lines and types without extensions
+                if len(parts) < 2 or parts[0][0] == "#":
+                    continue
+
+                mime_type = parts[0]
+                exts = [ext if ext[0] == "." else "." + ext for ext in parts[1:]]
+                # Map each extension to the MIME type
+                for ext in exts:
+                    types_map[ext] = mime_type
+                # Map MIME type to first extension for that type
+                if mime_type not in extensions_map:
+                    extensions_map[mime_type] = exts[0]
+
+            self.types_map.update(types_map)
+            self.extensions_map.update(extensions_map)
         except Exception as e:
             print(f"Error loading mime types from {mime_file_path}: {e}")
             # Initialize with basic MIME types if file loading fails
@@ -72,61 +98,7 @@ class CustomMimeTypes:
 
     def _init_basic_types(self) -> None:
         """Initialize with basic MIME types to ensure operation even if file loading fails."""
-        # Common video formats
-        for ext in [".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm"]:
-            self.types_map[ext] = (
-                "video/mp4"
-                if ext == ".mp4"
-                else (
-                    "video/x-matroska"
-                    if ext == ".mkv"
-                    else (
-                        "video/x-msvideo"
-                        if ext == ".avi"
-                        else (
-                            "video/quicktime"
-                            if ext == ".mov"
-                            else (
-                                "video/x-ms-wmv"
-                                if ext == ".wmv"
-                                else "video/x-flv" if ext == ".flv" else "video/webm"
-                            )
-                        )
-                    )
-                )
-            )
-
-        # Common audio formats
-        for ext in [".mp3", ".wav", ".ogg", ".aac", ".flac"]:
-            self.types_map[ext] = (
-                "audio/mpeg"
-                if ext == ".mp3"
-                else (
-                    "audio/wav"
-                    if ext == ".wav"
-                    else (
-                        "audio/ogg"
-                        if ext == ".ogg"
-                        else "audio/aac" if ext == ".aac" else "audio/flac"
-                    )
-                )
-            )
-
-        # Common image formats
-        for ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]:
-            self.types_map[ext] = (
-                "image/jpeg"
-                if ext in [".jpg", ".jpeg"]
-                else (
-                    "image/png"
-                    if ext == ".png"
-                    else (
-                        "image/gif"
-                        if ext == ".gif"
-                        else "image/bmp" if ext == ".bmp" else "image/webp"
-                    )
-                )
-            )
+        self.types_map.update(BASIC_TYPES)
 
         # Create the extensions map
         for ext, mime_type in self.types_map.items():
@@ -148,11 +120,9 @@ class CustomMimeTypes:
             A tuple (type, encoding) where type is the MIME type and
             encoding is the encoding (always None in this implementation).
         """
-        # Extract the filename from the URL and convert to lowercase
-        filename = os.path.basename(url.lower())
-
-        # Get the extension
-        _, ext = os.path.splitext(filename)
+        # splitext only looks at the last path component, so just the
+        # extension needs lowercasing
+        ext = os.path.splitext(url)[1].lower()
 
         # Return the MIME type if found, otherwise None
         return (self.types_map.get(ext), None)
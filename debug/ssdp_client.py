@@ -12,6 +12,8 @@ import struct
 HEADERS_TO_IGNORE = [ # Generally uninteresting headers
     'NT', 'ST'
 ]
+# Header lines start with "NAME:", matched case-insensitively
+IGNORE_PREFIXES = tuple(header + ':' for header in HEADERS_TO_IGNORE)
 
 HOSTS_SEEN = {}  # To keep track of unique hosts seen
 
@@ -30,6 +32,8 @@ class SSDPClient:
         self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
 
         self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        # Wake up regularly so stop() doesn't have to wait for a packet
+        self.sock.settimeout(0.5)
         self.running = True
         self.thread = threading.Thread(target=self.listen)
         self.thread.start()
@@ -39,38 +43,36 @@ class SSDPClient:
             try:
                 data, addr = self.sock.recvfrom(1024)
                 self.handle_ssdp_packet(data, addr)
+            except socket.timeout:
+                continue
             except Exception as e:
                 print(f"Error receiving SSDP packet: {e}")
 
     def handle_ssdp_packet(self, data, addr):
-        try:
-            decoded_data = data.decode('utf-8')
-            print(f"\nReceived SSDP packet from {addr[0]}:{addr[1]}:")
-            print("----------------------------------------")
-            server_name = None
-            for line in decoded_data.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                if line.startswith("SERVER:"):
-                    server_name = line.split("SERVER:", 1)[1].strip()
-                if any(header in line for header in HEADERS_TO_IGNORE):
-                    continue
-                print(line)
-            print("----------------------------------------")
+        print(f"\nReceived SSDP packet from {addr[0]}:{addr[1]}:")
+        print("----------------------------------------")
+        server_name = None
+        # Decode line by line so one bad byte doesn't hide the whole packet
+        for raw_line in data.splitlines():
+            line = raw_line.decode('utf-8', 'replace').strip()
+            if not line:
+                continue
+            if line.startswith("SERVER:"):
+                server_name = line.split("SERVER:", 1)[1].strip()
+            if line.upper().startswith(IGNORE_PREFIXES):
+                continue
+            print(line)
+        print("----------------------------------------")
 
-            # Update HOSTS_SEEN with the IP address and SERVER name
-            if server_name:
-                HOSTS_SEEN[addr[0]] = server_name
-
-        except UnicodeDecodeError:
-            print(f"\nReceived SSDP packet from {addr[0]}:{addr[1]} (unable to decode):")
-            print(data)
+        # Update HOSTS_SEEN with the IP address and SERVER name
+        if server_name:
+            HOSTS_SEEN[addr[0]] = server_name
 
     def stop(self):
         self.running = False
-        self.sock.close()
+        # Let the listener notice before closing its socket under it
         self.thread.join()
+        self.sock.close()
 
         # Print all hosts seen
         print("\nHosts seen during this session:")
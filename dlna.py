@@ -5,21 +5,26 @@ This module provides the HTTP request handler for a DLNA media server,
 implementing the necessary DLNA and UPnP protocols for media streaming.
 """
 
+import functools
 import html
 import traceback
 import os
 import socket
+import stat
 import struct
 import subprocess
+import threading
 import uuid
+import xml.etree.ElementTree as ET
 from helpers import (
+    build_xml_response,
     is_safe_path,
+    send_prebuilt_response,
     send_device_description,
     send_scpd_xml,
     handle_get_protocol_info,
     parse_avi_duration,
     parse_mp4_duration,
-    create_directory_mapping,
 )
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import unquote, urlparse, quote
@@ -30,21 +35,309 @@ try:
         SERVER_DESCRIPTION,
         SERVER_VERSION,
         SERVER_MANUFACTURER,
-        is_supported_media_file,
+        get_media_mime_type,
+        get_mime_type,
     )
-    from .custom_mimetypes import CustomMimeTypes
 except ImportError:
     from constants import (
         SERVER_AGENT,
         SERVER_DESCRIPTION,
         SERVER_VERSION,
         SERVER_MANUFACTURER,
-        is_supported_media_file,
+        get_media_mime_type,
+        get_mime_type,
     )
-    from custom_mimetypes import CustomMimeTypes
 
-# Create a global instance of CustomMimeTypes
-custom_mimetypes = CustomMimeTypes()
+# Headers that are the same on every media response, ending the header block
+MEDIA_RESPONSE_HEADERS = (
+    "Accept-Ranges: bytes\r\n"
+    "TransferMode.DLNA.ORG: Streaming\r\n"
+    f"Server: {SERVER_AGENT}\r\n"
+    # Keep connection alive for range requests
+    "Connection: keep-alive\r\n"
+    # Allow short-term caching for range requests
+    "Cache-Control: max-age=3600\r\n"
+    "\r\n"
+).encode("latin-1")
+
+# DIDL-Lite document wrapper and the storage folder container element
+DIDL_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/" '
+    'xmlns:dlna="urn:schemas-dlna-org:metadata-1-0/">\n'
+)
+DIDL_FOOTER = "\n</DIDL-Lite>"
+DIDL_CONTAINER = (
+    '<container id="{id}" parentID="{parent_id}" restricted="1" searchable="1" childCount="{child_count}">\n'
+    "    <dc:title>{title}</dc:title>\n"
+    "    <upnp:class>object.container.storageFolder</upnp:class>\n"
+    "    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
+    "</container>"
+)
+
+# DIDL-Lite <item> templates per media category, with the protocolInfo
+# DLNA field used when the exact MIME type has no entry in DIDL_RES_PROFILES
+_DIDL_STREAM_FLAGS = "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
+_DIDL_IMAGE_FLAGS = "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
+DIDL_VIDEO_ITEM = (
+    '<item id="{id}" parentID="{parent_id}" restricted="1">\n'
+    "    <dc:title>{title}</dc:title>\n"
+    "    <upnp:class>object.item.videoItem</upnp:class>\n"
+    "    <dc:creator>Unknown Creator</dc:creator>\n"
+    "    <upnp:artist>Unknown Artist</upnp:artist>\n"
+    "    <upnp:genre>Video</upnp:genre>\n"
+    "    <dc:description>Video File: {title}</dc:description>\n"
+    '    <res protocolInfo="{protocol_info}" {res_attrs}>{url}</res>\n'
+    "</item>"
+)
+DIDL_AUDIO_ITEM = (
+    '<item id="{id}" parentID="{parent_id}" restricted="1">\n'
+    "    <dc:title>{title}</dc:title>\n"
+    "    <upnp:class>object.item.audioItem.musicTrack</upnp:class>\n"
+    "    <dc:creator>Unknown Artist</dc:creator>\n"
+    "    <upnp:artist>Unknown Artist</upnp:artist>\n"
+    "    <upnp:album>Unknown Album</upnp:album>\n"
+    "    <upnp:genre>Music</upnp:genre>\n"
+    "    <dc:date>2024-01-01T00:00:00</dc:date>\n"  # Placeholder date
+    '    <res protocolInfo="{protocol_info}" {res_attrs}>{url}</res>\n'
+    "</item>"
+)
+DIDL_IMAGE_ITEM = (
+    '<item id="{id}" parentID="{parent_id}" restricted="1">\n'
+    "    <dc:title>{title}</dc:title>\n"
+    "    <upnp:class>object.item.imageItem.photo</upnp:class>\n"
+    "    <dc:creator>Unknown Creator</dc:creator>\n"
+    "    <upnp:artist>Unknown Artist</upnp:artist>\n"
+    "    <dc:description>Image: {title}</dc:description>\n"
+    '    <res protocolInfo="{protocol_info}" {res_attrs}>{url}</res>\n'
+    "</item>"
+)
+# Fallback for anything that is not video, audio or an image (should not
+# happen if filtering correctly)
+DIDL_GENERIC_ITEM = (
+    '<item id="{id}" parentID="{parent_id}" restricted="1">\n'
+    "    <dc:title>{title}</dc:title>\n"
+    "    <upnp:class>object.item</upnp:class>\n"
+    '    <res protocolInfo="{protocol_info}" {res_attrs}>{url}</res>\n'
+    "</item>"
+)
+DIDL_GENERIC_PROFILE = (
+    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000000"
+)
+DIDL_ITEM_TEMPLATES = {
+    "video": (DIDL_VIDEO_ITEM, _DIDL_STREAM_FLAGS),
+    "audio": (DIDL_AUDIO_ITEM, _DIDL_STREAM_FLAGS),
+    "image": (DIDL_IMAGE_ITEM, _DIDL_IMAGE_FLAGS),
+}
+
+# MIME type -> (protocolInfo DLNA field, <res> attributes after size/duration)
+DIDL_RES_PROFILES = {
+    "video/mp4": (
+        "DLNA.ORG_PN=AVC_MP4_MP_SD_AAC_MULT5;" + _DIDL_STREAM_FLAGS,
+        ' resolution="1280x720" bitrate="4000000"',
+    ),
+    "video/x-msvideo": (
+        "DLNA.ORG_PN=AVI;" + _DIDL_STREAM_FLAGS,
+        ' resolution="720x576" bitrate="1500000"',
+    ),
+    "video/x-matroska": (
+        "DLNA.ORG_PN=MATROSKA;" + _DIDL_STREAM_FLAGS,
+        ' resolution="1920x1080" bitrate="8000000"',
+    ),
+    "video/quicktime": (_DIDL_STREAM_FLAGS, ' resolution="1280x720" bitrate="4000000"'),
+    "video/x-ms-wmv": (_DIDL_STREAM_FLAGS, ' resolution="1024x768" bitrate="2000000"'),
+    "video/x-flv": (_DIDL_STREAM_FLAGS, ' resolution="640x480" bitrate="1000000"'),
+    "video/webm": (_DIDL_STREAM_FLAGS, ' resolution="1280x720" bitrate="3000000"'),
+    "video/x-m4v": (_DIDL_STREAM_FLAGS, ' resolution="1280x720" bitrate="4000000"'),
+    "video/3gpp": (_DIDL_STREAM_FLAGS, ' resolution="320x240" bitrate="500000"'),
+    "audio/mpeg": ("DLNA.ORG_PN=MP3;" + _DIDL_STREAM_FLAGS, ' bitrate="320000"'),
+    "audio/wav": ("DLNA.ORG_PN=LPCM;" + _DIDL_STREAM_FLAGS, ' bitrate="1411200"'),
+    "audio/mp4": ("DLNA.ORG_PN=AAC_ISO_320;" + _DIDL_STREAM_FLAGS, ' bitrate="320000"'),
+    "audio/x-m4a": (
+        "DLNA.ORG_PN=AAC_ISO_320;" + _DIDL_STREAM_FLAGS,
+        ' bitrate="320000"',
+    ),
+    "audio/flac": (_DIDL_STREAM_FLAGS, ' bitrate="1000000"'),
+    "audio/ogg": (_DIDL_STREAM_FLAGS, ' bitrate="320000"'),
+    "audio/x-ms-wma": (_DIDL_STREAM_FLAGS, ' bitrate="256000"'),
+    "audio/aiff": (_DIDL_STREAM_FLAGS, ' bitrate="1411200"'),
+    "image/jpeg": (
+        "DLNA.ORG_PN=JPEG_LRG;" + _DIDL_IMAGE_FLAGS,
+        ' resolution="1920x1080"',
+    ),
+    "image/png": (
+        "DLNA.ORG_PN=PNG_LRG;" + _DIDL_IMAGE_FLAGS,
+        ' resolution="1920x1080"',
+    ),
+    "image/gif": (_DIDL_IMAGE_FLAGS, ' resolution="800x600"'),
+    "image/bmp": (_DIDL_IMAGE_FLAGS, ' resolution="1024x768"'),
+    "image/tiff": (_DIDL_IMAGE_FLAGS, ' resolution="2048x1536"'),
+    "image/webp": (_DIDL_IMAGE_FLAGS, ' resolution="1920x1080"'),
+}
+
+# Browse embeds the DIDL-Lite document as escaped text inside <Result>.
+# Escaping works character by character, so escaping the templates once here
+# and each substituted value at build time gives the same bytes as escaping
+# the finished document, without another pass over it.
+ESCAPED_DIDL_HEADER = html.escape(DIDL_HEADER).encode()
+ESCAPED_DIDL_FOOTER = html.escape(DIDL_FOOTER).encode()
+ESCAPED_DIDL_CONTAINER = html.escape(DIDL_CONTAINER)
+ESCAPED_DIDL_ITEM_TEMPLATES = {
+    category: (html.escape(template), profile)
+    for category, (template, profile) in DIDL_ITEM_TEMPLATES.items()
+}
+ESCAPED_DIDL_GENERIC_ITEM = html.escape(DIDL_GENERIC_ITEM)
+
+
+def didl_container(object_id, parent_id, child_count, title):
+    """Return an escaped storage folder <container> for a Browse result"""
+    return ESCAPED_DIDL_CONTAINER.format(
+        id=html.escape(str(object_id)),
+        parent_id=html.escape(str(parent_id)),
+        child_count=child_count,
+        title=html.escape(html.escape(title)),
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def didl_media_names(rel_path, name):
+    """
+    Return (quoted URL path, escaped title) for a media file's DIDL item.
+    Listings are stable between content changes, so repeat Browse requests
+    reuse these rather than quoting and escaping every name again.
+    """
+    return quote(rel_path, safe=""), html.escape(html.escape(name))
+
+
+# SOAP responses that never change, with their headers, encoded once at import
+CURRENT_CONNECTION_IDS_RESPONSE = build_xml_response(
+    """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <u:GetCurrentConnectionIDsResponse xmlns:u="urn:schemas-upnp-org:service:ConnectionManager:1">
+            <ConnectionIDs>0</ConnectionIDs>
+        </u:GetCurrentConnectionIDsResponse>
+    </s:Body>
+</s:Envelope>""".encode()
+)
+
+CURRENT_CONNECTION_INFO_RESPONSE = build_xml_response(
+    """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <u:GetCurrentConnectionInfoResponse xmlns:u="urn:schemas-upnp-org:service:ConnectionManager:1">
+            <RcsID>-1</RcsID>
+            <AVTransportID>-1</AVTransportID>
+            <ProtocolInfo></ProtocolInfo>
+            <PeerConnectionManager></PeerConnectionManager>
+            <PeerConnectionID>-1</PeerConnectionID>
+            <Direction>Output</Direction>
+            <Status>OK</Status>
+        </u:GetCurrentConnectionInfoResponse>
+    </s:Body>
+</s:Envelope>""".encode()
+)
+
+SEARCH_CAPABILITIES_RESPONSE = build_xml_response(
+    """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <u:GetSearchCapabilitiesResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
+            <SearchCaps>dc:title,dc:creator,upnp:class,upnp:genre,dc:date</SearchCaps>
+        </u:GetSearchCapabilitiesResponse>
+    </s:Body>
+</s:Envelope>""".encode()
+)
+
+SORT_CAPABILITIES_RESPONSE = build_xml_response(
+    """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <u:GetSortCapabilitiesResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
+            <SortCaps>dc:title,dc:creator,dc:date,upnp:class</SortCaps>
+        </u:GetSortCapabilitiesResponse>
+    </s:Body>
+</s:Envelope>""".encode()
+)
+
+# Browse envelope around the escaped DIDL-Lite <Result>
+BROWSE_RESPONSE_PREFIX = b"""<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">
+    <s:Body>
+        <u:BrowseResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
+            <Result>"""
+BROWSE_RESPONSE_SUFFIX = """</Result>
+            <NumberReturned>{number_returned}</NumberReturned>
+            <TotalMatches>{total_matches}</TotalMatches>
+            <UpdateID>{system_update_id}</UpdateID>
+        </u:BrowseResponse>
+    </s:Body>
+</s:Envelope>"""
+
+# contentFeatures values for streamed media, by exact MIME type
+_STREAMING_FEATURES = (
+    "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000"
+)
+DLNA_CONTENT_FEATURES = {
+    "video/x-msvideo": _STREAMING_FEATURES,
+    "video/mp4": "DLNA.ORG_PN=MP4_SD_AAC_LTP;" + _STREAMING_FEATURES,
+    # MKV files - use generic video profile with streaming support
+    "video/x-matroska": "DLNA.ORG_PN=AVC_MP4_BL_CIF15_AAC_520;" + _STREAMING_FEATURES,
+    "video/quicktime": _STREAMING_FEATURES,
+    "video/x-ms-wmv": _STREAMING_FEATURES,
+    "video/x-flv": _STREAMING_FEATURES,
+    "video/webm": _STREAMING_FEATURES,
+    "video/x-m4v": _STREAMING_FEATURES,
+    "video/3gpp": _STREAMING_FEATURES,
+    "audio/mpeg": "DLNA.ORG_PN=MP3;" + _STREAMING_FEATURES,
+    "audio/wav": "DLNA.ORG_PN=LPCM;" + _STREAMING_FEATURES,
+    "audio/mp4": "DLNA.ORG_PN=AAC_ISO_320;" + _STREAMING_FEATURES,
+    "audio/x-m4a": "DLNA.ORG_PN=AAC_ISO_320;" + _STREAMING_FEATURES,
+}
+
+
+def dlna_content_features(mime_type):
+    """Return the ContentFeatures.DLNA.ORG header value for a MIME type"""
+    features = DLNA_CONTENT_FEATURES.get(mime_type)
+    if features is not None:
+        return features
+    if mime_type.startswith("video/"):
+        return "DLNA.ORG_PN=AVC_MP4_BL_CIF15_AAC_520;" + _STREAMING_FEATURES
+    if mime_type.startswith("audio/"):
+        return _STREAMING_FEATURES
+    return "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
+
+
+def parse_soap_args(soap_data, names):
+    """
+    Return a dict of the named SOAP arguments found in soap_data.
+
+    The envelope is parsed once with ElementTree and arguments are matched
+    regardless of namespace. Bodies that are not well-formed XML fall back
+    to a plain tag search so lenient clients keep working.
+    """
+    try:
+        root = ET.fromstring(soap_data)
+    except ET.ParseError:
+        root = None
+
+    args = {}
+    for name in names:
+        if root is not None:
+            value = root.findtext(f".//{{*}}{name}")
+        else:
+            value = None
+            start = soap_data.find(f"<{name}")
+            if start != -1:
+                start = soap_data.find(">", start)
+                end = soap_data.find(f"</{name}>", start) if start != -1 else -1
+                if end != -1:
+                    value = soap_data[start + 1 : end]
+        if value is not None:
+            args[name] = value.strip()
+    return args
 
 
 class DLNAHandler(BaseHTTPRequestHandler):
@@ -60,9 +353,31 @@ class DLNAHandler(BaseHTTPRequestHandler):
     # These are set dynamically in app.py when creating the Handler subclass
     server_instance = None  # Reference to the ZeroConfigDLNA server instance
     verbose = False  # Verbose logging flag
+    # Guards IDs added to the server's shared directory mapping
+    _mapping_lock = threading.Lock()
     server_name = None  # Server name, set by the server instance
     fast = False  # Fast mode flag to disable subprocess calls
 
+    # Exact GET paths -> handler; /media/ is matched by prefix after these
+    _GET_ROUTES = {
+        "/description.xml": send_device_description,
+        "/cd_scpd.xml": lambda h: send_scpd_xml(h, "ContentDirectory"),
+        "/cm_scpd.xml": lambda h: send_scpd_xml(h, "ConnectionManager"),
+        "/browse": lambda h: h.send_browse_response(),
+    }
+
+    # SOAP action name -> handler. Insertion order is also the order used
+    # when the action has to be found by scanning the request body.
+    _SOAP_DISPATCH = {
+        "Browse": lambda h, data: h.handle_browse_request(data),
+        "GetProtocolInfo": lambda h, data: handle_get_protocol_info(h),
+        "GetCurrentConnectionIDs": lambda h, data: h.handle_get_current_connection_ids(),
+        "GetCurrentConnectionInfo": lambda h, data: h.handle_get_current_connection_info(),
+        "GetSearchCapabilities": lambda h, data: h.handle_get_search_capabilities(),
+        "GetSortCapabilities": lambda h, data: h.handle_get_sort_capabilities(),
+        "GetSystemUpdateID": lambda h, data: h.handle_get_system_update_id(),
+    }
+
     def __init__(self, *args, **kwargs):
         # Set default timeout for socket operations (5 minutes)
         self.timeout = 300
@@ -80,7 +395,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
             # Just log it and return gracefully
             print(f"Client disconnected during handler initialization: {e}")
 
-        if self.fast:
+        if self.fast and self.verbose:
             print("Fast mode enabled - subprocess calls will be disabled")
 
         self.now_playing = "None"
@@ -100,6 +415,21 @@ class DLNAHandler(BaseHTTPRequestHandler):
         self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
         self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
 
+    def _set_cork(self, enabled):
+        """
+        Set TCP_CORK on the connection where the platform supports it (Linux).
+        Returns True if the option was set.
+        """
+        if not hasattr(socket, "TCP_CORK"):
+            return False
+        try:
+            self.connection.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_CORK, 1 if enabled else 0
+            )
+            return True
+        except OSError:
+            return False
+
     def log_message(self, format, *args):  # pylint: disable=redefined-builtin
         """Override BaseHTTPRequestHandler's log_message to only log when verbose mode is enabled"""
         if hasattr(self, "verbose") and self.verbose:
@@ -110,21 +440,17 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def do_GET(self):  # pylint: disable=invalid-name
         """Handle GET requests for media files and DLNA control"""
         try:
-            parsed_path = urlparse(self.path)
-            path = unquote(parsed_path.path)
+            # Routes are plain paths, so just drop the query string; the
+            # media filename is unquoted once, in serve_media_file
+            path = self.path.partition("?")[0]
 
             if self.verbose:
                 print(f"GET request: {self.path} -> {path}")
                 print(f"Headers: {dict(self.headers)}")
 
-            if path == "/description.xml":
-                send_device_description(self)
-            elif path == "/cd_scpd.xml":
-                send_scpd_xml(self, "ContentDirectory")
-            elif path == "/cm_scpd.xml":
-                send_scpd_xml(self, "ConnectionManager")
-            elif path == "/browse":
-                self.send_browse_response()
+            route = self._GET_ROUTES.get(path)
+            if route is not None:
+                route(self)
             elif path.startswith("/media/"):
                 if self.verbose:
                     print(f"Media request: {path[7:]}")
@@ -153,8 +479,9 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def do_HEAD(self):  # pylint: disable=invalid-name
         """Handle HEAD requests for media files (for DLNA compatibility)"""
         try:
-            parsed_path = urlparse(self.path)
-            path = unquote(parsed_path.path)
+            # Routes are plain paths, so just drop the query string; the
+            # media filename is unquoted once, in serve_media_file
+            path = self.path.partition("?")[0]
 
             if self.verbose:
                 print(f"HEAD request: {self.path} -> {path}")
@@ -193,7 +520,6 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 content_length = int(self.headers.get("Content-Length", 0))
                 post_data = self.rfile.read(content_length)
                 soap_action = self.headers.get("SOAPAction", "").strip('"')
-                print(f"SOAP Action: {soap_action}")
                 self.handle_soap_request(post_data, soap_action)
             else:
                 print(f"POST to unknown path: {self.path}")
@@ -308,43 +634,39 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 return
 
             # Make sure path exists
-            if not os.path.exists(current_full_path) or not os.path.isdir(
-                current_full_path
-            ):
+            if not os.path.isdir(current_full_path):
                 self.send_error(404, "Directory not found")
                 return  # Get directory contents
             items = []
-            for item_name in os.listdir(current_full_path):
-                item_path = os.path.join(current_full_path, item_name)
+            for (
+                item_name,
+                is_dir,
+                mime_type,
+                size,
+            ) in self.server_instance.list_directory(current_full_path):
                 relative_path = (
                     os.path.join(current_dir, item_name) if current_dir else item_name
                 )
 
-                if os.path.isdir(item_path):
+                if is_dir:
                     # Add directory
                     items.append(
                         {"name": item_name, "path": relative_path, "is_dir": True}
                     )
-                elif os.path.isfile(item_path):
-                    mime_type, _ = custom_mimetypes.guess_type(item_name)
-                    if mime_type and (
-                        mime_type.startswith("video/")
-                        or mime_type.startswith("audio/")
-                        or mime_type.startswith("image/")
-                    ):
-                        # Add media file
-                        url_path = relative_path.replace("\\", "/")
-                        encoded_path = quote(url_path)
-                        items.append(
-                            {
-                                "name": item_name,
-                                "path": relative_path,
-                                "is_dir": False,
-                                "url": f"http://{self.server_instance.server_ip}:{self.server_instance.port}/media/{encoded_path}",
-                                "mime_type": mime_type,
-                                "size": os.path.getsize(item_path),
-                            }
-                        )
+                else:
+                    # Add media file
+                    url_path = relative_path.replace("\\", "/")
+                    encoded_path = quote(url_path)
+                    items.append(
+                        {
+                            "name": item_name,
+                            "path": relative_path,
+                            "is_dir": False,
+                            "url": f"{self.server_instance.base_url}/media/{encoded_path}",
+                            "mime_type": mime_type,
+                            "size": size,
+                        }
+                    )
 
             # Count media files
             media_file_count = sum(1 for item in items if not item.get("is_dir", False))
@@ -361,8 +683,10 @@ class DLNAHandler(BaseHTTPRequestHandler):
                         cumulative_path = os.path.join(cumulative_path, part)
                         breadcrumbs.append({"name": part, "path": cumulative_path})
 
-            # Simple HTML response for browser testing
-            html = f"""<!DOCTYPE html>
+            # Simple HTML response for browser testing, built up as a list of
+            # fragments and joined once at the end
+            html_parts = [
+                f"""<!DOCTYPE html>
 <html>
 <head>
     <title>{self.server_name}</title>
@@ -388,20 +712,25 @@ class DLNAHandler(BaseHTTPRequestHandler):
     
     <ul class="breadcrumb">
 """
+            ]
 
             # Add breadcrumb navigation
             for crumb in breadcrumbs:
                 if crumb == breadcrumbs[-1]:  # Current directory
-                    html += f'        <li>{crumb["name"]}</li>\n'
+                    html_parts.append(f'        <li>{crumb["name"]}</li>\n')
                 else:
-                    html += f'        <li><a href="/browse?path={quote(crumb["path"])}">{crumb["name"]}</a></li>\n'
+                    html_parts.append(
+                        f'        <li><a href="/browse?path={quote(crumb["path"])}">{crumb["name"]}</a></li>\n'
+                    )
 
-            html += f"""    </ul>
+            html_parts.append(
+                f"""    </ul>
     
     <div class="current-path">Current directory: {os.path.join(self.server_instance.media_directory, current_dir)}</div>
     <p>Found {media_file_count} media files in this directory</p>
     
     <ul class="file-list">"""
+            )
 
             # Sort items: directories first, then files
             sorted_items = sorted(
@@ -411,15 +740,18 @@ class DLNAHandler(BaseHTTPRequestHandler):
             for item in sorted_items:
                 if item.get("is_dir", False):
                     # Display directory with folder icon and link to browse
-                    html += f"""
+                    html_parts.append(
+                        f"""
         <li class="file-item dir-item">
             <div class="file-name">
                 <a href="/browse?path={quote(item['path'])}"><span class="folder-icon">📁</span> {item['name']}</a>
             </div>
         </li>"""
+                    )
                 else:
                     # Display media file with link
-                    html += f"""
+                    html_parts.append(
+                        f"""
         <li class="file-item">
             <div class="file-name">
                 <a href="{item['url']}" target="_blank">{item['name']}</a>
@@ -428,17 +760,22 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 Type: {item['mime_type']} | Size: {item['size']:,} bytes
             </div>
         </li>"""
+                    )
 
-            html += """
+            html_parts.append(
+                """
     </ul>
 </body>
 </html>"""
+            )
+            # Encode before measuring: the folder icon is more than one byte
+            body = "".join(html_parts).encode()
 
             self.send_response(200)
             self.send_header("Content-Type", "text/html")
-            self.send_header("Content-Length", str(len(html)))
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
-            self.wfile.write(html.encode())
+            self.wfile.write(body)
 
         except Exception as e:
             self.send_error(500, f"Error reading directory: {str(e)}")
@@ -453,7 +790,12 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 self.server_instance.media_directory, decoded_filename
             )
 
-            if not os.path.exists(file_path) or not os.path.isfile(file_path):
+            # One stat covers the existence, regular-file and size checks
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                file_stat = None
+            if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
                 self.send_error(404, "File not found")
                 return
 
@@ -463,15 +805,16 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 print(f"SECURITY WARNING: Attempted directory traversal to {file_path}")
                 return
 
-            mime_type, _ = custom_mimetypes.guess_type(file_path)
+            mime_type = get_mime_type(file_path)
             if not mime_type:
                 mime_type = "application/octet-stream"
 
-            file_size = os.path.getsize(file_path)
+            file_size = file_stat.st_size
 
-            print(
-                f"Serving file: {decoded_filename} (size: {file_size}, type: {mime_type}, head_only: {head_only})"
-            )
+            if self.verbose:
+                print(
+                    f"Serving file: {decoded_filename} (size: {file_size}, type: {mime_type}, head_only: {head_only})"
+                )
 
             # Log DLNA client info
             client_addr = self.client_address
@@ -523,8 +866,8 @@ class DLNAHandler(BaseHTTPRequestHandler):
     ):
         """Handle HTTP range requests for streaming
 
-        Uses smaller chunk sizes compared to full file streaming to improve
-        responsiveness during video resume/seek operations and reduce choppiness.
+        The requested byte range is sent with socket.sendfile(), which uses
+        zero-copy os.sendfile() where the platform supports it.
 
         For Xbox compatibility, this method ALWAYS returns 206 Partial Content,
         even when Range header is missing, malformed, or Range: bytes=0-
@@ -543,15 +886,17 @@ class DLNAHandler(BaseHTTPRequestHandler):
 
             # Parse Range header if present and valid
             if range_header and range_header.startswith("bytes="):
-                range_match = range_header.replace("bytes=", "").split("-")
-                if len(range_match) == 2:
+                # Usually "bytes=N-"; anything with extra dashes or several
+                # ranges fails the checks below and falls back to the entire file
+                start_str, dash, end_str = range_header[6:].partition("-")
+                if dash:
                     try:
                         # Parse start position
-                        if range_match[0]:
-                            start = int(range_match[0])
+                        if start_str:
+                            start = int(start_str)
                         # Parse end position
-                        if range_match[1]:
-                            end = int(range_match[1])
+                        if end_str:
+                            end = int(end_str)
 
                         # Validate range bounds
                         if start < 0 or end >= file_size or start > end:
@@ -576,122 +921,42 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 else:
                     print(f"Standard range request: {range_header}")
 
-            self.send_response(206)
-            self.send_header("Content-Type", mime_type)
-            self.send_header("Content-Length", str(content_length))
-            self.send_header("Content-Range", f"bytes {start}-{end}/{file_size}")
-            self.send_header("Accept-Ranges", "bytes")
-            # Add DLNA headers for better device compatibility
-            if mime_type.startswith("video/"):
-                if mime_type == "video/x-msvideo":
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type == "video/mp4":
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=MP4_SD_AAC_LTP;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type == "video/x-matroska":
-                    # MKV files - use generic video profile with streaming support
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=AVC_MP4_BL_CIF15_AAC_520;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type in (
-                    "video/quicktime",
-                    "video/x-ms-wmv",
-                    "video/x-flv",
-                    "video/webm",
-                    "video/x-m4v",
-                    "video/3gpp",
-                ):
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                else:
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=AVC_MP4_BL_CIF15_AAC_520;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-            elif mime_type.startswith("audio/"):
-                if mime_type == "audio/mpeg":
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type == "audio/wav":
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=LPCM;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type in ("audio/mp4", "audio/x-m4a"):
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                elif mime_type in (
-                    "audio/flac",
-                    "audio/ogg",
-                    "audio/x-ms-wma",
-                    "audio/aiff",
-                ):
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-                else:
-                    self.send_header(
-                        "ContentFeatures.DLNA.ORG",
-                        "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-                    )
-            else:
-                self.send_header(
-                    "ContentFeatures.DLNA.ORG",
-                    "DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-                )
-            self.send_header("TransferMode.DLNA.ORG", "Streaming")
-            self.send_header("Server", SERVER_AGENT)
-            # Keep connection alive for range requests
-            self.send_header("Connection", "keep-alive")
-            # Add cache control - allow short-term caching for range requests
-            self.send_header("Cache-Control", "max-age=3600")
-            self.end_headers()
+            # Only the status line and the per-file headers are formatted per
+            # request; the fixed ones are pre-encoded and appended
+            self.log_request(206)
+            headers = (
+                f"{self.protocol_version} 206 Partial Content\r\n"
+                f"Server: {self.version_string()}\r\n"
+                f"Date: {self.date_time_string()}\r\n"
+                f"Content-Type: {mime_type}\r\n"
+                f"Content-Length: {content_length}\r\n"
+                f"Content-Range: bytes {start}-{end}/{file_size}\r\n"
+                # Add DLNA headers for better device compatibility
+                f"ContentFeatures.DLNA.ORG: {dlna_content_features(mime_type)}\r\n"
+            ).encode("latin-1", "strict") + MEDIA_RESPONSE_HEADERS
+            # send_header() would have done this for "Connection: keep-alive"
+            self.close_connection = False
+            # Cork the socket so the headers go out in the same packet as the
+            # start of the body rather than in a small packet of their own
+            corked = not head_only and self._set_cork(True)
+            try:
+                self.wfile.write(headers)
+
+                # Only send file content for GET requests, not HEAD. An empty file
+                # has no body, and socket.sendfile() rejects a count of zero.
+                if not head_only and content_length > 0:
+                    with open(file_path, "rb") as f:
+                        # Make sure the headers are on the wire before the body
+                        self.wfile.flush()
 
-            # Only send file content for GET requests, not HEAD
-            if not head_only:
-                with open(file_path, "rb") as f:
-                    f.seek(start)
-                    remaining = content_length
-
-                    # Set a timeout for socket operations to prevent blocking
-                    self.wfile.flush()
-
-                    # Use smaller chunks for range requests to improve resume/seek performance
-                    # Large chunks can cause choppy playback when resuming video
-                    base_chunk_size = 512 * 1024  # 512KB
-
-                    while remaining > 0:
-                        # For range requests, use smaller chunks for better streaming
-                        # This helps with choppy playback when resuming videos
-                        chunk_size = min(base_chunk_size, remaining)
-                        if remaining > 2 * 1024 * 1024:  # If more than 2MB remaining
-                            chunk_size = min(
-                                16 * 1024, remaining
-                            )  # Use 16KB chunks max
-
-                        chunk = f.read(chunk_size)
-                        if not chunk:
-                            break
                         try:
-                            self.wfile.write(chunk)
-                            # Flush more frequently for range requests to reduce latency
-                            # This helps with responsive seeking and resume functionality
-                            if remaining % (base_chunk_size * 2) == 0:
-                                self.wfile.flush()
-                            remaining -= len(chunk)
+                            # socket.sendfile() uses os.sendfile() where available, so
+                            # the kernel copies straight from the page cache to the
+                            # socket without passing the data through Python. It
+                            # falls back to a read/send loop on other platforms.
+                            self.connection.sendfile(
+                                f, offset=start, count=content_length
+                            )
                         except BrokenPipeError:
                             # Client disconnected, log it and exit gracefully
                             # This happens a lot due to how DLNA clients handle streaming
@@ -707,8 +972,11 @@ class DLNAHandler(BaseHTTPRequestHandler):
                                     f"Connection reset during streaming of {os.path.basename(file_path)}"
                                 )
                             return
-                    # Final flush
-                    self.wfile.flush()
+            finally:
+                # Uncork to push out any partial final segment, including
+                # when opening the file or writing the headers failed
+                if corked:
+                    self._set_cork(False)
 
         except BrokenPipeError:
             # Client disconnected before we could send headers
@@ -739,41 +1007,27 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 )  # First 500 chars for debugging
                 print(f"SOAP Headers: {self.headers}")
 
-            # Determine which service is being addressed
-            if "ContentDirectory" in soap_action:
-                print("ContentDirectory service action detected")
-            elif "ConnectionManager" in soap_action:
-                print("ConnectionManager service action detected")
-            else:
-                print(f"Unknown service in SOAP action: {soap_action}")
-
-            # Parse SOAP action from the request or header
-            if "Browse" in soap_data or "Browse" in soap_action:
-                self.handle_browse_request(soap_data)
-            elif "GetProtocolInfo" in soap_data or "GetProtocolInfo" in soap_action:
-                handle_get_protocol_info(self)
-            elif (
-                "GetCurrentConnectionIDs" in soap_data
-                or "GetCurrentConnectionIDs" in soap_action
-            ):
-                self.handle_get_current_connection_ids()
-            elif (
-                "GetCurrentConnectionInfo" in soap_data
-                or "GetCurrentConnectionInfo" in soap_action
-            ):
-                self.handle_get_current_connection_info()
-            elif (
-                "GetSearchCapabilities" in soap_data
-                or "GetSearchCapabilities" in soap_action
-            ):
-                self.handle_get_search_capabilities()
-            elif (
-                "GetSortCapabilities" in soap_data
-                or "GetSortCapabilities" in soap_action
-            ):
-                self.handle_get_sort_capabilities()
-            elif "GetSystemUpdateID" in soap_data or "GetSystemUpdateID" in soap_action:
-                self.handle_get_system_update_id()
+                # Determine which service is being addressed
+                if "ContentDirectory" in soap_action:
+                    print("ContentDirectory service action detected")
+                elif "ConnectionManager" in soap_action:
+                    print("ConnectionManager service action detected")
+                else:
+                    print(f"Unknown service in SOAP action: {soap_action}")
+
+            # The SOAPAction header looks like "urn:...:service:Name:1#Action"
+            action = soap_action.strip().strip('"').rpartition("#")[2]
+            handler = self._SOAP_DISPATCH.get(action)
+            if handler is None:
+                # Some clients omit or mangle the header, so look for the
+                # action name in the body instead
+                handler = next(
+                    (h for name, h in self._SOAP_DISPATCH.items() if name in soap_data),
+                    None,
+                )
+
+            if handler is not None:
+                handler(self, soap_data)
             else:
                 print(f"Unsupported SOAP action: {soap_action}")
                 print(
@@ -795,13 +1049,13 @@ class DLNAHandler(BaseHTTPRequestHandler):
             </detail>
         </s:Fault>
     </s:Body>
-</s:Envelope>"""
+</s:Envelope>""".encode()
 
                 self.send_response(500)
                 self.send_header("Content-Type", "text/xml; charset=utf-8")
                 self.send_header("Content-Length", str(len(response)))
                 self.end_headers()
-                self.wfile.write(response.encode())
+                self.wfile.write(response)
                 print("Sent error response for unsupported action")
 
         except Exception as e:
@@ -812,22 +1066,10 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def handle_get_current_connection_ids(self):
         """Handle ConnectionManager GetCurrentConnectionIDs requests"""
         try:
-            print("Handling GetCurrentConnectionIDs request")
-
-            response = """<?xml version="1.0" encoding="utf-8"?>
-<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
-    <s:Body>
-        <u:GetCurrentConnectionIDsResponse xmlns:u="urn:schemas-upnp-org:service:ConnectionManager:1">
-            <ConnectionIDs>0</ConnectionIDs>
-        </u:GetCurrentConnectionIDsResponse>
-    </s:Body>
-</s:Envelope>"""
+            if self.verbose:
+                print("Handling GetCurrentConnectionIDs request")
 
-            self.send_response(200)
-            self.send_header("Content-Type", "text/xml; charset=utf-8")
-            self.send_header("Content-Length", str(len(response)))
-            self.end_headers()
-            self.wfile.write(response.encode())
+            send_prebuilt_response(self, 200, CURRENT_CONNECTION_IDS_RESPONSE)
             if self.verbose:
                 print("Sent GetCurrentConnectionIDs response")
 
@@ -839,28 +1081,10 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def handle_get_current_connection_info(self):
         """Handle ConnectionManager GetCurrentConnectionInfo requests"""
         try:
-            print("Handling GetCurrentConnectionInfo request")
-
-            response = """<?xml version="1.0" encoding="utf-8"?>
-<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
-    <s:Body>
-        <u:GetCurrentConnectionInfoResponse xmlns:u="urn:schemas-upnp-org:service:ConnectionManager:1">
-            <RcsID>-1</RcsID>
-            <AVTransportID>-1</AVTransportID>
-            <ProtocolInfo></ProtocolInfo>
-            <PeerConnectionManager></PeerConnectionManager>
-            <PeerConnectionID>-1</PeerConnectionID>
-            <Direction>Output</Direction>
-            <Status>OK</Status>
-        </u:GetCurrentConnectionInfoResponse>
-    </s:Body>
-</s:Envelope>"""
+            if self.verbose:
+                print("Handling GetCurrentConnectionInfo request")
 
-            self.send_response(200)
-            self.send_header("Content-Type", "text/xml; charset=utf-8")
-            self.send_header("Content-Length", str(len(response)))
-            self.end_headers()
-            self.wfile.write(response.encode())
+            send_prebuilt_response(self, 200, CURRENT_CONNECTION_INFO_RESPONSE)
             if self.verbose:
                 print("Sent GetCurrentConnectionInfo response")
 
@@ -872,25 +1096,10 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def handle_get_search_capabilities(self):
         """Handle ContentDirectory GetSearchCapabilities requests"""
         try:
-            print("Handling GetSearchCapabilities request")
-
-            # Define basic search capabilities
-            search_caps = "dc:title,dc:creator,upnp:class,upnp:genre,dc:date"
-
-            response = f"""<?xml version="1.0" encoding="utf-8"?>
-<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
-    <s:Body>
-        <u:GetSearchCapabilitiesResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
-            <SearchCaps>{search_caps}</SearchCaps>
-        </u:GetSearchCapabilitiesResponse>
-    </s:Body>
-</s:Envelope>"""
+            if self.verbose:
+                print("Handling GetSearchCapabilities request")
 
-            self.send_response(200)
-            self.send_header("Content-Type", "text/xml; charset=utf-8")
-            self.send_header("Content-Length", str(len(response)))
-            self.end_headers()
-            self.wfile.write(response.encode())
+            send_prebuilt_response(self, 200, SEARCH_CAPABILITIES_RESPONSE)
             if self.verbose:
                 print("Sent GetSearchCapabilities response")
 
@@ -902,25 +1111,10 @@ class DLNAHandler(BaseHTTPRequestHandler):
     def handle_get_sort_capabilities(self):
         """Handle ContentDirectory GetSortCapabilities requests"""
         try:
-            print("Handling GetSortCapabilities request")
-
-            # Define basic sort capabilities
-            sort_caps = "dc:title,dc:creator,dc:date,upnp:class"
-
-            response = f"""<?xml version="1.0" encoding="utf-8"?>
-<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
-    <s:Body>
-        <u:GetSortCapabilitiesResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
-            <SortCaps>{sort_caps}</SortCaps>
-        </u:GetSortCapabilitiesResponse>
-    </s:Body>
-</s:Envelope>"""
+            if self.verbose:
+                print("Handling GetSortCapabilities request")
 
-            self.send_response(200)
-            self.send_header("Content-Type", "text/xml; charset=utf-8")
-            self.send_header("Content-Length", str(len(response)))
-            self.end_headers()
-            self.wfile.write(response.encode())
+            send_prebuilt_response(self, 200, SORT_CAPABILITIES_RESPONSE)
             if self.verbose:
                 print("Sent GetSortCapabilities response")
 
@@ -945,7 +1139,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
             <Id>{system_update_id}</Id>
         </u:GetSystemUpdateIDResponse>
     </s:Body>
-</s:Envelope>"""
+</s:Envelope>""".encode()
 
             self.send_response(200)
             self.send_header("Content-Type", "text/xml; charset=utf-8")
@@ -953,7 +1147,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
             # Allow reasonable caching of SystemUpdateID response
             self.send_header("Cache-Control", "max-age=30")
             self.end_headers()
-            self.wfile.write(response.encode())
+            self.wfile.write(response)
             if self.verbose:
                 print(f"Sent GetSystemUpdateID response: {system_update_id}")
 
@@ -968,73 +1162,21 @@ class DLNAHandler(BaseHTTPRequestHandler):
             if self.verbose:
                 print(f"Browse request: {soap_data}")
 
-            # Parse SOAP parameters using simple string parsing
-            object_id = "0"  # Default to root
-            browse_flag = "BrowseDirectChildren"  # Default
-
-            # Extract ObjectID from SOAP - handle XML with attributes
-            if "<ObjectID" in soap_data:
-                # Find the opening tag (might have attributes)
-                start_tag_start = soap_data.find("<ObjectID")
-                if start_tag_start != -1:
-                    # Find the end of the opening tag
-                    start_tag_end = soap_data.find(">", start_tag_start)
-                    if start_tag_end != -1:
-                        # Find the closing tag
-                        end_tag_start = soap_data.find("</ObjectID>", start_tag_end)
-                        if end_tag_start != -1:
-                            # Extract the content between tags
-                            object_id = soap_data[
-                                start_tag_end + 1 : end_tag_start
-                            ].strip()
-                            print(f"Extracted ObjectID: '{object_id}'")
-
-            # Extract BrowseFlag from SOAP - handle XML with attributes
-            if "<BrowseFlag" in soap_data:
-                start_tag_start = soap_data.find("<BrowseFlag")
-                if start_tag_start != -1:
-                    start_tag_end = soap_data.find(">", start_tag_start)
-                    if start_tag_end != -1:
-                        end_tag_start = soap_data.find("</BrowseFlag>", start_tag_end)
-                        if end_tag_start != -1:
-                            browse_flag = soap_data[
-                                start_tag_end + 1 : end_tag_start
-                            ].strip()
-                            print(f"Extracted BrowseFlag: '{browse_flag}'")
-
-            # Extract StartingIndex and RequestedCount from SOAP - handle XML with attributes
-            starting_index = 0
-            requested_count = None
-            if "<StartingIndex" in soap_data:
-                start_tag_start = soap_data.find("<StartingIndex")
-                if start_tag_start != -1:
-                    start_tag_end = soap_data.find(">", start_tag_start)
-                    if start_tag_end != -1:
-                        end_tag_start = soap_data.find(
-                            "</StartingIndex>", start_tag_end
-                        )
-                        if end_tag_start != -1:
-                            try:
-                                starting_index = int(
-                                    soap_data[start_tag_end + 1 : end_tag_start].strip()
-                                )
-                            except Exception:
-                                starting_index = 0
-            if "<RequestedCount" in soap_data:
-                start_tag_start = soap_data.find("<RequestedCount")
-                if start_tag_start != -1:
-                    start_tag_end = soap_data.find(">", start_tag_start)
-                    if start_tag_end != -1:
-                        end_tag_start = soap_data.find(
-                            "</RequestedCount>", start_tag_end
-                        )
-                        if end_tag_start != -1:
-                            try:
-                                requested_count = int(
-                                    soap_data[start_tag_end + 1 : end_tag_start].strip()
-                                )
-                            except Exception:
-                                requested_count = None
+            args = parse_soap_args(
+                soap_data,
+                ("ObjectID", "BrowseFlag", "StartingIndex", "RequestedCount"),
+            )
+            object_id = args.get("ObjectID", "0")  # Default to root
+            browse_flag = args.get("BrowseFlag", "BrowseDirectChildren")
+
+            try:
+                starting_index = int(args.get("StartingIndex", 0))
+            except ValueError:
+                starting_index = 0
+            try:
+                requested_count = int(args["RequestedCount"])
+            except (KeyError, ValueError):
+                requested_count = None
 
             if self.verbose:
                 print(f"Browse ObjectID: {object_id}, BrowseFlag: {browse_flag}")
@@ -1042,8 +1184,8 @@ class DLNAHandler(BaseHTTPRequestHandler):
                     f"StartingIndex: {starting_index}, RequestedCount: {requested_count}"
                 )
 
-            # Setup the directory structure mapping - regenerate on each browse for fresh content
-            # This is simpler and ensures clients always see current directory state
+            # The server rebuilds the mapping whenever the SystemUpdateID moves,
+            # so clients still see the current directory state
             self.directory_mapping = self._create_directory_mapping()
 
             # Generate DIDL-Lite XML for media files
@@ -1060,11 +1202,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
                     self.server_instance.media_directory
                 )
                 didl_items.append(
-                    f'<container id="1" parentID="0" restricted="1" searchable="1" childCount="{child_count}">\n'
-                    "    <dc:title>Media Library</dc:title>\n"
-                    "    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                    "    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                    "</container>"
+                    didl_container("1", "0", child_count, "Media Library")
                 )
                 number_returned = 1
                 total_matches = 1
@@ -1079,30 +1217,43 @@ class DLNAHandler(BaseHTTPRequestHandler):
                         f"Browsing main media directory: {self.server_instance.media_directory}"
                     )
                 # Get direct children (files and folders) in the root media directory
-                children = []
+                listing = self.server_instance.list_directory(
+                    self.server_instance.media_directory
+                )
 
                 # List directory contents for debugging
-                try:
-                    dir_contents = os.listdir(self.server_instance.media_directory)
-                    if self.verbose:
+                if self.verbose:
+                    try:
+                        dir_contents = os.listdir(self.server_instance.media_directory)
                         print(
                             f"Directory contains {len(dir_contents)} items: {dir_contents[:10]}..."
                         )  # Show first 10 items
-                except Exception as e:
-                    print(f"Error listing directory: {e}")
-                    total_matches = 0
-                    number_returned = 0
+                    except Exception as e:
+                        print(f"Error listing directory: {e}")
 
-                for item_name in os.listdir(self.server_instance.media_directory):
+                # Get total number of direct children
+                total_matches = len(listing)
+                if self.verbose:
+                    print(f"Found {total_matches} children in media directory")
+                    print(
+                        f"Children: {[entry[0] for entry in listing[:5]]}..."
+                    )  # Show first 5 names
+
+                # Apply pagination before building entries, so IDs and child
+                # counts are only worked out for the items being returned
+                children_slice = []
+                for item_name, is_dir, mime_type, size in self._page(
+                    listing, starting_index, requested_count
+                ):
                     item_path = os.path.join(
                         self.server_instance.media_directory, item_name
                     )
-                    if os.path.isdir(item_path):
+                    if is_dir:
                         # Add directory
                         dir_id = self._get_id_for_path(item_name)
                         # Count child items
                         child_count = self._count_dir_children(item_path)
-                        children.append(
+                        children_slice.append(
                             {
                                 "id": dir_id,
                                 "name": item_name,
@@ -1110,42 +1261,20 @@ class DLNAHandler(BaseHTTPRequestHandler):
                                 "child_count": child_count,
                             }
                         )
-                    elif os.path.isfile(item_path):
-                        mime_type, _ = custom_mimetypes.guess_type(item_name)
-                        if mime_type and (
-                            mime_type.startswith("video/")
-                            or mime_type.startswith("audio/")
-                            or mime_type.startswith("image/")
-                        ):
-                            # Add media file
-                            file_id = self._get_id_for_path(item_name)
-                            children.append(
-                                {
-                                    "id": file_id,
-                                    "name": item_name,
-                                    "is_dir": False,
-                                    "path": item_name,
-                                    "full_path": item_path,
-                                    "mime_type": mime_type,
-                                    "size": os.path.getsize(item_path),
-                                }
-                            )
-
-                # Get total number of direct children
-                total_matches = len(children)
-                if self.verbose:
-                    print(f"Found {total_matches} children in media directory")
-                    print(
-                        f"Children: {[child['name'] for child in children[:5]]}..."
-                    )  # Show first 5 names
-
-                # Apply pagination
-                if requested_count is not None and requested_count > 0:
-                    children_slice = children[
-                        starting_index : starting_index + requested_count
-                    ]
-                else:
-                    children_slice = children[starting_index:]
+                    else:
+                        # Add media file
+                        file_id = self._get_id_for_path(item_name)
+                        children_slice.append(
+                            {
+                                "id": file_id,
+                                "name": item_name,
+                                "is_dir": False,
+                                "path": item_name,
+                                "full_path": item_path,
+                                "mime_type": mime_type,
+                                "size": size,
+                            }
+                        )
 
                 number_returned = len(children_slice)
                 if self.verbose:
@@ -1157,12 +1286,8 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 for child in children_slice:
                     if child["is_dir"]:
                         # This is a directory/container
-                        container = (
-                            f'<container id="{child["id"]}" parentID="1" restricted="1" searchable="1" childCount="{child["child_count"]}">\n'
-                            f'    <dc:title>{html.escape(child["name"])}</dc:title>\n'
-                            f"    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                            f"    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                            f"</container>"
+                        container = didl_container(
+                            child["id"], "1", child["child_count"], child["name"]
                         )
                         didl_items.append(container)
                     else:
@@ -1182,18 +1307,24 @@ class DLNAHandler(BaseHTTPRequestHandler):
                     )
 
                     # Check if the path exists and is a directory
-                    if os.path.exists(full_path) and os.path.isdir(full_path):
+                    if os.path.isdir(full_path):
                         # Get contents of this directory
-                        children = []
-                        for item_name in os.listdir(full_path):
+                        listing = self.server_instance.list_directory(full_path)
+                        total_matches = len(listing)
+
+                        # Only build entries for the requested page
+                        children_slice = []
+                        for item_name, is_dir, mime_type, size in self._page(
+                            listing, starting_index, requested_count
+                        ):
                             item_path = os.path.join(full_path, item_name)
                             rel_path = os.path.join(dir_path, item_name)
 
-                            if os.path.isdir(item_path):
+                            if is_dir:
                                 # Add subdirectory
                                 subdir_id = self._get_id_for_path(rel_path)
                                 child_count = self._count_dir_children(item_path)
-                                children.append(
+                                children_slice.append(
                                     {
                                         "id": subdir_id,
                                         "name": item_name,
@@ -1201,37 +1332,20 @@ class DLNAHandler(BaseHTTPRequestHandler):
                                         "child_count": child_count,
                                     }
                                 )
-                            elif os.path.isfile(item_path):
-                                mime_type, _ = custom_mimetypes.guess_type(item_name)
-                                if mime_type and (
-                                    mime_type.startswith("video/")
-                                    or mime_type.startswith("audio/")
-                                    or mime_type.startswith("image/")
-                                ):
-                                    # Add media file
-                                    file_id = self._get_id_for_path(rel_path)
-                                    children.append(
-                                        {
-                                            "id": file_id,
-                                            "name": item_name,
-                                            "is_dir": False,
-                                            "path": rel_path,
-                                            "full_path": item_path,
-                                            "mime_type": mime_type,
-                                            "size": os.path.getsize(item_path),
-                                        }
-                                    )
-
-                        # Get total number of direct children
-                        total_matches = len(children)
-
-                        # Apply pagination
-                        if requested_count is not None and requested_count > 0:
-                            children_slice = children[
-                                starting_index : starting_index + requested_count
-                            ]
-                        else:
-                            children_slice = children[starting_index:]
+                            else:
+                                # Add media file
+                                file_id = self._get_id_for_path(rel_path)
+                                children_slice.append(
+                                    {
+                                        "id": file_id,
+                                        "name": item_name,
+                                        "is_dir": False,
+                                        "path": rel_path,
+                                        "full_path": item_path,
+                                        "mime_type": mime_type,
+                                        "size": size,
+                                    }
+                                )
 
                         number_returned = len(children_slice)
 
@@ -1239,12 +1353,11 @@ class DLNAHandler(BaseHTTPRequestHandler):
                         for child in children_slice:
                             if child["is_dir"]:
                                 # This is a directory/container
-                                container = (
-                                    f'<container id="{child["id"]}" parentID="{object_id}" restricted="1" searchable="1" childCount="{child["child_count"]}">\n'
-                                    f'    <dc:title>{html.escape(child["name"])}</dc:title>\n'
-                                    f"    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                                    f"    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                                    f"</container>"
+                                container = didl_container(
+                                    child["id"],
+                                    object_id,
+                                    child["child_count"],
+                                    child["name"],
                                 )
                                 didl_items.append(container)
                             else:
@@ -1271,11 +1384,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 if object_id == "0":
                     # Root container metadata
                     didl_items.append(
-                        '<container id="0" parentID="-1" restricted="1" searchable="1" childCount="1">\n'
-                        "    <dc:title>Media Library</dc:title>\n"
-                        "    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                        "    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                        "</container>"
+                        didl_container("0", "-1", 1, "Media Library")
                     )
                     total_matches = 1
                     number_returned = 1
@@ -1285,11 +1394,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
                         self.server_instance.media_directory
                     )
                     didl_items.append(
-                        f'<container id="1" parentID="0" restricted="1" searchable="1" childCount="{child_count}">\n'
-                        "    <dc:title>Media Library</dc:title>\n"
-                        "    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                        "    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                        "</container>"
+                        didl_container("1", "0", child_count, "Media Library")
                     )
                     total_matches = 1
                     number_returned = 1
@@ -1302,31 +1407,27 @@ class DLNAHandler(BaseHTTPRequestHandler):
                             self.server_instance.media_directory, item_path
                         )
                         parent_id = self._get_parent_id(object_id)
+                        # One stat answers both the type and the size
+                        try:
+                            item_stat = os.stat(full_path)
+                            item_mode = item_stat.st_mode
+                        except OSError:
+                            item_mode = 0
 
-                        if os.path.isdir(full_path):
+                        if stat.S_ISDIR(item_mode):
                             # Directory metadata
                             dir_name = os.path.basename(item_path)
                             child_count = self._count_dir_children(full_path)
 
-                            container = (
-                                f'<container id="{object_id}" parentID="{parent_id}" restricted="1" searchable="1" childCount="{child_count}">\n'
-                                f"    <dc:title>{html.escape(dir_name)}</dc:title>\n"
-                                f"    <upnp:class>object.container.storageFolder</upnp:class>\n"
-                                f"    <upnp:writeStatus>NOT_WRITABLE</upnp:writeStatus>\n"
-                                f"</container>"
+                            container = didl_container(
+                                object_id, parent_id, child_count, dir_name
                             )
                             didl_items.append(container)
-                        elif os.path.isfile(full_path):
+                        elif stat.S_ISREG(item_mode):
                             # File metadata
                             file_name = os.path.basename(item_path)
-                            mime_type, _ = custom_mimetypes.guess_type(file_name)
-
-                            if mime_type and (
-                                mime_type.startswith("video/")
-                                or mime_type.startswith("audio/")
-                                or mime_type.startswith("image/")
-                            ):
-
+                            mime_type = get_media_mime_type(file_name)
+                            if mime_type:
                                 file_info = {
                                     "id": object_id,
                                     "name": file_name,
@@ -1334,7 +1435,7 @@ class DLNAHandler(BaseHTTPRequestHandler):
                                     "path": item_path,
                                     "full_path": full_path,
                                     "mime_type": mime_type,
-                                    "size": os.path.getsize(full_path),
+                                    "size": item_stat.st_size,
                                 }
 
                                 didl_items.append(
@@ -1352,44 +1453,47 @@ class DLNAHandler(BaseHTTPRequestHandler):
                 total_matches = 0
                 number_returned = 0
 
-            # Create DIDL-Lite response
-            didl_xml = (
-                '<?xml version="1.0" encoding="utf-8"?>\n'
-                '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" '
-                'xmlns:dc="http://purl.org/dc/elements/1.1/" '
-                'xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/" '
-                'xmlns:dlna="urn:schemas-dlna-org:metadata-1-0/">\n'
-                + "\n".join(didl_items)
-                + "\n</DIDL-Lite>"
-            )
+            # The DIDL items are built pre-escaped, so encode them straight
+            # into one growing buffer rather than joining another copy
+            result = bytearray(ESCAPED_DIDL_HEADER)
+            for i, item in enumerate(didl_items):
+                if i:
+                    result += b"\n"
+                result += item.encode()
+            result += ESCAPED_DIDL_FOOTER
 
             if self.verbose:
                 print(f"Result: {number_returned} items of {total_matches} total")
 
             # Create SOAP response using the server's SystemUpdateID
             system_update_id = self.server_instance.get_system_update_id()
+            suffix = BROWSE_RESPONSE_SUFFIX.format(
+                number_returned=number_returned,
+                total_matches=total_matches,
+                system_update_id=system_update_id,
+            ).encode()
+            content_length = (
+                len(BROWSE_RESPONSE_PREFIX)
+                + len(result)
+                + len(suffix)
+            )
 
-            response = f"""<?xml version="1.0" encoding="utf-8"?>
-<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">
-    <s:Body>
-        <u:BrowseResponse xmlns:u="urn:schemas-upnp-org:service:ContentDirectory:1">
-            <Result>{html.escape(didl_xml)}</Result>
-            <NumberReturned>{number_returned}</NumberReturned>
-            <TotalMatches>{total_matches}</TotalMatches>
-            <UpdateID>{system_update_id}</UpdateID>
-        </u:BrowseResponse>
-    </s:Body>
-</s:Envelope>"""
-
-            self.send_response(200)
-            self.send_header("Content-Type", 'text/xml; charset="utf-8"')
-            self.send_header("Content-Length", str(len(response)))
-            self.send_header("Ext", "")
-            self.send_header("Server", SERVER_AGENT)
-            # Allow very short-term caching but ensure revalidation with server
-            self.send_header("Cache-Control", "max-age=10, must-revalidate")
-            self.end_headers()
-            self.wfile.write(response.encode())
+            corked = self._set_cork(True)
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", 'text/xml; charset="utf-8"')
+                self.send_header("Content-Length", str(content_length))
+                self.send_header("Ext", "")
+                self.send_header("Server", SERVER_AGENT)
+                # Allow very short-term caching but ensure revalidation with server
+                self.send_header("Cache-Control", "max-age=10, must-revalidate")
+                self.end_headers()
+                self.wfile.write(BROWSE_RESPONSE_PREFIX)
+                self.wfile.write(result)
+                self.wfile.write(suffix)
+            finally:
+                if corked:
+                    self._set_cork(False)
 
             if self.verbose:
                 print(f"Browse response sent with SystemUpdateID: {system_update_id}")
@@ -1399,10 +1503,16 @@ class DLNAHandler(BaseHTTPRequestHandler):
             traceback.print_exc()
             self.send_error(500, "Internal server error")
 
+    @staticmethod
+    def _page(listing, starting_index, requested_count):
+        """Return the slice of a directory listing that a Browse asked for"""
+        if requested_count is not None and requested_count > 0:
+            return listing[starting_index : starting_index + requested_count]
+        return listing[starting_index:]
+
     def _create_directory_mapping(self):
-        """Create a mapping between directory paths and IDs"""
-        # Use the helper function from helpers.py
-        return create_directory_mapping(self.server_instance.media_directory)
+        """Get the server's mapping between directory paths and IDs"""
+        return self.server_instance.get_directory_mapping()
 
     def _get_id_for_path(self, path):
         """Get the ID for a specific path"""
@@ -1413,10 +1523,16 @@ class DLNAHandler(BaseHTTPRequestHandler):
         if path in self.directory_mapping:
             return self.directory_mapping[path]
 
-        # If not found, add it to the mapping
-        new_id = str(max(int(id) for id in self.directory_mapping if id.isdigit()) + 1)
-        self.directory_mapping[new_id] = path
-        self.directory_mapping[path] = new_id
+        # If not found, add it to the mapping. The mapping is shared between
+        # request threads, so allocate the new ID under a lock
+        with self._mapping_lock:
+            if path in self.directory_mapping:
+                return self.directory_mapping[path]
+            new_id = str(
+                max(int(id) for id in self.directory_mapping if id.isdigit()) + 1
+            )
+            self.directory_mapping[new_id] = path
+            self.directory_mapping[path] = new_id
         return new_id
 
     def _get_path_for_id(self, id_str):
@@ -1445,18 +1561,13 @@ class DLNAHandler(BaseHTTPRequestHandler):
 
     def _count_dir_children(self, dir_path):
         """Count the number of media files and subdirectories in a directory"""
-        count = 0
         try:
-            for item in os.listdir(dir_path):
-                item_path = os.path.join(dir_path, item)
-                if os.path.isdir(item_path):
-                    count += 1
-                elif os.path.isfile(item_path):
-                    if is_supported_media_file(item_path):
-                        count += 1
+            # Same entries as browsing the directory, and the listing is
+            # cached, so child counts are free until the directory changes
+            return len(self.server_instance.list_directory(dir_path))
         except Exception as e:
             print(f"Error counting directory children in {dir_path}: {e}")
-        return count
+            return 0
 
     def _get_media_duration(self, file_path, mime_type):
         """
@@ -1582,209 +1693,38 @@ class DLNAHandler(BaseHTTPRequestHandler):
 
     def _create_media_item_didl(self, file_info, parent_id):
         """Create DIDL-Lite XML for a media item"""
-        file_path = file_info["full_path"]
-        file_size = file_info["size"]
-        file = file_info["name"]
-        relative_path = file_info["path"]
         mime_type = file_info["mime_type"]
-        file_id = file_info["id"]
+        file_size = file_info["size"]
 
         # Use the relative path for the URL
-        encoded_path = quote(relative_path, safe="")
-        file_url = f"http://{self.server_instance.server_ip}:{self.server_instance.port}/media/{encoded_path}"
+        encoded_path, title = didl_media_names(file_info["path"], file_info["name"])
+        file_url = f"{self.server_instance.base_url}/media/{encoded_path}"
 
-        # Default values
-        dlna_profile = "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000000"  # Generic
-        res_attrs = f'size="{file_size}"'
-        dc_date = "2024-01-01T00:00:00"  # Placeholder date
-        upnp_class = "object.item.videoItem"  # Default to video
-
-        # Get actual duration for media files
-        duration = self._get_media_duration(file_path, mime_type)
-
-        if mime_type and mime_type.startswith("video/"):
-            if mime_type == "video/mp4":
-                dlna_profile = "DLNA.ORG_PN=AVC_MP4_MP_SD_AAC_MULT5;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1280x720" bitrate="4000000"'
-            elif mime_type == "video/x-msvideo":  # AVI
-                dlna_profile = "DLNA.ORG_PN=AVI;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="720x576" bitrate="1500000"'
-            elif mime_type == "video/x-matroska" or file.lower().endswith(
-                ".mkv"
-            ):  # MKV
-                dlna_profile = "DLNA.ORG_PN=MATROSKA;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1920x1080" bitrate="8000000"'
-            elif mime_type == "video/quicktime":  # MOV
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1280x720" bitrate="4000000"'
-            elif mime_type == "video/x-ms-wmv":  # WMV
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1024x768" bitrate="2000000"'
-            elif mime_type == "video/x-flv":  # FLV
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="640x480" bitrate="1000000"'
-            elif mime_type == "video/webm":  # WEBM
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1280x720" bitrate="3000000"'
-            elif mime_type == "video/x-m4v":  # M4V
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="1280x720" bitrate="4000000"'
-            elif mime_type == "video/3gpp":  # 3GP
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" resolution="320x240" bitrate="500000"'
-            else:
-                # Default for unknown video formats
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}"'
-
-            escaped_title = html.escape(file)
-            protocol_info = f"http-get:*:{mime_type}:{dlna_profile}"
-
-            return (
-                f'<item id="{file_id}" parentID="{parent_id}" restricted="1">\n'
-                f"    <dc:title>{escaped_title}</dc:title>\n"
-                f"    <upnp:class>{upnp_class}</upnp:class>\n"
-                f"    <dc:creator>Unknown Creator</dc:creator>\n"
-                f"    <upnp:artist>Unknown Artist</upnp:artist>\n"
-                f"    <upnp:genre>Video</upnp:genre>\n"
-                f"    <dc:description>Video File: {escaped_title}</dc:description>\n"
-                f'    <res protocolInfo="{protocol_info}" {res_attrs}>{file_url}</res>\n'
-                f"</item>"
-            )
-
-        if mime_type and mime_type.startswith("audio/"):
-            upnp_class = "object.item.audioItem.musicTrack"
-            if mime_type == "audio/mpeg":  # MP3
-                dlna_profile = "DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = f'size="{file_size}" duration="{duration}" bitrate="320000"'
-            elif mime_type == "audio/wav":  # WAV
-                dlna_profile = "DLNA.ORG_PN=LPCM;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = (
-                    f'size="{file_size}" duration="{duration}" bitrate="1411200"'
-                )
-            elif mime_type in ("audio/mp4", "audio/x-m4a"):  # AAC/M4A
-                dlna_profile = "DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                res_attrs = f'size="{file_size}" duration="{duration}" bitrate="320000"'
-            elif mime_type == "audio/flac":  # FLAC
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = (
-                    f'size="{file_size}" duration="{duration}" bitrate="1000000"'
-                )
-            elif mime_type == "audio/ogg":  # OGG
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" bitrate="320000"'
-            elif mime_type == "audio/x-ms-wma":  # WMA
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}" bitrate="256000"'
-            elif mime_type == "audio/aiff":  # AIFF
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = (
-                    f'size="{file_size}" duration="{duration}" bitrate="1411200"'
-                )
-            else:
-                # Default for unknown audio formats
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" duration="{duration}"'
-
-            escaped_title = html.escape(file)
-            protocol_info = f"http-get:*:{mime_type}:{dlna_profile}"
-
-            return (
-                f'<item id="{file_id}" parentID="{parent_id}" restricted="1">\n'
-                f"    <dc:title>{escaped_title}</dc:title>\n"
-                f"    <upnp:class>{upnp_class}</upnp:class>\n"
-                f"    <dc:creator>Unknown Artist</dc:creator>\n"
-                f"    <upnp:artist>Unknown Artist</upnp:artist>\n"
-                f"    <upnp:album>Unknown Album</upnp:album>\n"
-                f"    <upnp:genre>Music</upnp:genre>\n"
-                f"    <dc:date>{dc_date}</dc:date>\n"
-                f'    <res protocolInfo="{protocol_info}" {res_attrs}>{file_url}</res>\n'
-                f"</item>"
-            )
-
-        if mime_type and mime_type.startswith("image/"):
-            upnp_class = "object.item.imageItem.photo"
-            if mime_type == "image/jpeg":
-                dlna_profile = "DLNA.ORG_PN=JPEG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                res_attrs = f'size="{file_size}" resolution="1920x1080"'
-            elif mime_type == "image/png":
-                dlna_profile = "DLNA.ORG_PN=PNG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                res_attrs = f'size="{file_size}" resolution="1920x1080"'
-            elif mime_type == "image/gif":  # GIF
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" resolution="800x600"'
-            elif mime_type == "image/bmp":  # BMP
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" resolution="1024x768"'
-            elif mime_type == "image/tiff":  # TIFF
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" resolution="2048x1536"'
-            elif mime_type == "image/webp":  # WEBP
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}" resolution="1920x1080"'
-            else:
-                # Default for unknown image formats
-                dlna_profile = (
-                    "DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000"
-                )
-                res_attrs = f'size="{file_size}"'
-
-            escaped_title = html.escape(file)
-            protocol_info = f"http-get:*:{mime_type}:{dlna_profile}"
-
-            return (
-                f'<item id="{file_id}" parentID="{parent_id}" restricted="1">\n'
-                f"    <dc:title>{escaped_title}</dc:title>\n"
-                f"    <upnp:class>{upnp_class}</upnp:class>\n"
-                f"    <dc:creator>Unknown Creator</dc:creator>\n"
-                f"    <upnp:artist>Unknown Artist</upnp:artist>\n"
-                f"    <dc:description>Image: {escaped_title}</dc:description>\n"
-                f'    <res protocolInfo="{protocol_info}" {res_attrs}>{file_url}</res>\n'
-                f"</item>"
-            )
-
-        # Default case (should not happen if filtering correctly)
-        escaped_title = html.escape(file)
-        protocol_info = f"http-get:*:{mime_type}:{dlna_profile}"
+        category = mime_type.partition("/")[0] if mime_type else ""
+        template, default_profile = ESCAPED_DIDL_ITEM_TEMPLATES.get(
+            category, (ESCAPED_DIDL_GENERIC_ITEM, DIDL_GENERIC_PROFILE)
+        )
+        dlna_profile, extra_attrs = DIDL_RES_PROFILES.get(
+            mime_type, (default_profile, "")
+        )
 
-        return (
-            f'<item id="{file_id}" parentID="{parent_id}" restricted="1">\n'
-            f"    <dc:title>{escaped_title}</dc:title>\n"
-            f"    <upnp:class>object.item</upnp:class>\n"
-            f'    <res protocolInfo="{protocol_info}" {res_attrs}>{file_url}</res>\n'
-            f"</item>"
+        if category in ("video", "audio"):
+            # Get actual duration for media files
+            duration = self._get_media_duration(file_info["full_path"], mime_type)
+            res_attrs = f'size="{file_size}" duration="{duration}"{extra_attrs}'
+        else:
+            res_attrs = f'size="{file_size}"{extra_attrs}'
+
+        # The template is already escaped for <Result>, so values are escaped
+        # once more here (the title twice, as it is text in DIDL). The URL is
+        # left alone since quoting leaves nothing in it to escape.
+        return template.format(
+            id=html.escape(str(file_info["id"])),
+            parent_id=html.escape(str(parent_id)),
+            title=title,
+            protocol_info=html.escape(f"http-get:*:{mime_type}:{dlna_profile}"),
+            res_attrs=html.escape(res_attrs),
+            url=file_url,
         )
 
     def handle_subscribe_request(self):
@@ -1804,7 +1744,8 @@ class DLNAHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Length", "0")
             self.end_headers()
 
-            print(f"Sent SUBSCRIBE response with SID: {sid}")
+            if self.verbose:
+                print(f"Sent SUBSCRIBE response with SID: {sid}")
 
         except Exception as e:
             print(f"Error handling SUBSCRIBE request: {e}")
@@ -1822,7 +1763,8 @@ class DLNAHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Length", "0")
             self.end_headers()
 
-            print("Sent UNSUBSCRIBE response")
+            if self.verbose:
+                print("Sent UNSUBSCRIBE response")
 
         except Exception as e:
             print(f"Error handling UNSUBSCRIBE request: {e}")
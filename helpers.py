@@ -1,3 +1,4 @@
+import functools
 import os
 import struct
 import traceback
@@ -5,10 +6,17 @@ from constants import (
     SERVER_MANUFACTURER,
     SERVER_VERSION,
     SERVER_AGENT,
+    is_ignored_dir,
     is_supported_media_file,
 )
 
 
+@functools.lru_cache(maxsize=8)
+def _resolve_base_dir(base_dir):
+    """Resolve and normalize a base directory once rather than per request"""
+    return os.path.normcase(os.path.normpath(os.path.realpath(base_dir)))
+
+
 def is_safe_path(base_dir, requested_path):
     """
     Verify that the requested path is contained within the base directory.
@@ -22,18 +30,14 @@ def is_safe_path(base_dir, requested_path):
         bool: True if the path is safe, False otherwise
     """
     # Normalize paths (handle case sensitivity, symbolic links, etc.)
-    base_dir = os.path.normcase(os.path.normpath(os.path.realpath(base_dir)))
+    base_dir = _resolve_base_dir(base_dir)
 
-    # Handle relative paths before realpath resolves symlinks, then normalize
+    # Handle relative paths before realpath resolves symlinks, then normalize.
+    # The requested path is always resolved so symlinks can't escape base_dir
     requested_path = os.path.normcase(
         os.path.normpath(os.path.realpath(os.path.abspath(requested_path)))
     )
 
-    # First quick check - if no common prefix, definitely unsafe
-    if not os.path.commonprefix([base_dir, requested_path]) == base_dir:
-        return False
-
-    # For more accuracy, use commonpath if available (Python 3.5+)
     try:
         return os.path.commonpath([base_dir, requested_path]) == base_dir
     except (ValueError, AttributeError):
@@ -61,37 +65,84 @@ def create_directory_mapping(media_directory):
     # Start ID counter from 2 (0 and 1 are reserved)
     id_counter = 2
 
-    # Helper function to scan directories recursively
-    def scan_dir(dir_path, relative_path=""):
-        nonlocal id_counter
+    # Walk with an explicit stack of open directory iterators rather than
+    # recursion, so deep trees can't hit the recursion limit. IDs are still
+    # assigned in the same depth-first order. Each stack frame also records
+    # the directory's (st_dev, st_ino) so symlink loops are not followed.
+    try:
+        root_stat = os.stat(media_directory)
+        stack = [
+            (
+                media_directory,
+                os.scandir(media_directory),
+                "",
+                (root_stat.st_dev, root_stat.st_ino),
+            )
+        ]
+    except Exception as e:
+        print(f"Error scanning directory {media_directory}: {e}")
+        return mapping
+    ancestors = {stack[0][3]}
 
+    while stack:
+        dir_path, it, rel_prefix, dir_key = stack[-1]
         try:
-            for item in os.listdir(dir_path):
-                item_path = os.path.join(dir_path, item)
-                item_rel_path = (
-                    os.path.join(relative_path, item) if relative_path else item
-                )
-
-                # Assign an ID to this path
-                mapping[str(id_counter)] = item_rel_path
-                mapping[item_rel_path] = str(id_counter)
-                id_counter += 1
-
-                # Recursively scan subdirectories
-                if os.path.isdir(item_path):
-                    scan_dir(item_path, item_rel_path)
+            entry = next(it, None)
+            is_dir = entry is not None and entry.is_dir()
         except Exception as e:
             print(f"Error scanning directory {dir_path}: {e}")
-
-    # Start scanning from the media directory
-    scan_dir(media_directory)
+            entry = None
+
+        if entry is None:
+            # Finished (or failed) listing this directory
+            it.close()
+            stack.pop()
+            ancestors.discard(dir_key)
+            continue
+
+        # Hidden and ignored directories are not browsable, so they get no ID
+        if is_dir and is_ignored_dir(entry.name):
+            continue
+
+        item_rel_path = f"{rel_prefix}{entry.name}"
+
+        # Assign an ID to this path
+        mapping[str(id_counter)] = item_rel_path
+        mapping[item_rel_path] = str(id_counter)
+        id_counter += 1
+
+        # Descend into subdirectories
+        if is_dir:
+            try:
+                entry_stat = entry.stat()
+                entry_key = (entry_stat.st_dev, entry_stat.st_ino)
+                if entry_key not in ancestors:
+                    stack.append(
+                        (
+                            entry.path,
+                            os.scandir(entry.path),
+                            f"{item_rel_path}{os.sep}",
+                            entry_key,
+                        )
+                    )
+                    ancestors.add(entry_key)
+            except Exception as e:
+                print(f"Error scanning directory {entry.path}: {e}")
 
     return mapping
 
 
-def send_device_description(self):
-    """Send UPnP device description XML"""
-    device_xml = f"""<?xml version="1.0" encoding="utf-8"?>
+def build_device_description(server_instance, device_uuid):
+    """Render the UPnP device description XML for a server instance.
+
+    Args:
+        server_instance: The ZeroConfigDLNA server being described
+        device_uuid: The device UUID to advertise
+
+    Returns:
+        str: The device description XML
+    """
+    return f"""<?xml version="1.0" encoding="utf-8"?>
 <root xmlns="urn:schemas-upnp-org:device-1-0" xmlns:dlna="urn:schemas-dlna-org:device-1-0">
 <specVersion>
     <major>1</major>
@@ -99,15 +150,15 @@ def send_device_description(self):
 </specVersion>
 <device>
     <deviceType>urn:schemas-upnp-org:device:MediaServer:1</deviceType>
-    <friendlyName>{self.server_name}</friendlyName>
+    <friendlyName>{server_instance.server_name}</friendlyName>
     <manufacturer>{SERVER_MANUFACTURER}</manufacturer>
     <manufacturerURL>https://github.com/richstokes/ZeroConfigDLNA</manufacturerURL>
     <modelDescription>DLNA/UPnP Media Server</modelDescription>
-    <modelName>{self.server_name}</modelName>
+    <modelName>{server_instance.server_name}</modelName>
     <modelNumber>{SERVER_VERSION}</modelNumber>
     <modelURL>https://github.com/richstokes/ZeroConfigDLNA</modelURL>
     <serialNumber>12345678</serialNumber>
-    <UDN>uuid:{self.server_instance.device_uuid}</UDN>
+    <UDN>uuid:{device_uuid}</UDN>
     <dlna:X_DLNADOC xmlns:dlna="urn:schemas-dlna-org:device-1-0">DMS-1.50</dlna:X_DLNADOC>
     <serviceList>
         <service>
@@ -125,27 +176,59 @@ def send_device_description(self):
             <SCPDURL>/cm_scpd.xml</SCPDURL>
         </service>
     </serviceList>
-    <presentationURL>http://{self.server_instance.server_ip}:{self.server_instance.port}/</presentationURL>
+    <presentationURL>http://{server_instance.server_ip}:{server_instance.port}/</presentationURL>
 </device>
 </root>"""
 
-    self.send_response(200)
-    self.send_header("Content-Type", "text/xml; charset=utf-8")
-    self.send_header("Content-Length", str(len(device_xml)))
-    self.send_header("Access-Control-Allow-Origin", "*")
-    self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-    self.send_header("Access-Control-Allow-Headers", "Content-Type, SOAPAction")
-    self.send_header("Server", SERVER_AGENT)
-    self.end_headers()
-    self.wfile.write(device_xml.encode())
 
+def send_prebuilt_response(self, code, response):
+    """
+    Send the status line plus Server and Date headers, followed by a
+    pre-encoded block of the remaining headers and the body, in one write.
+    """
+    self.log_request(code)
+    head = (
+        f"{self.protocol_version} {code} {self.responses[code][0]}\r\n"
+        f"Server: {self.version_string()}\r\n"
+        f"Date: {self.date_time_string()}\r\n"
+    )
+    self.wfile.write(head.encode("latin-1") + response)
 
-def send_scpd_xml(self, service_type):
-    """Send Service Control Point Definition XML for the specified service type."""
-    scpd_xml = ""
-    if service_type == "ContentDirectory":
-        # Basic SCPD for ContentDirectory - this should be expanded based on actual implemented actions
-        scpd_xml = """<?xml version="1.0" encoding="utf-8"?>
+
+def build_xml_response(body, extra_headers=""):
+    """
+    Pre-encode the headers and body of a text/xml response for
+    send_prebuilt_response; extra_headers are CRLF-terminated lines.
+    """
+    return (
+        "Content-Type: text/xml; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"{extra_headers}"
+        "\r\n"
+    ).encode("latin-1") + body
+
+
+@functools.lru_cache(maxsize=2)
+def _device_description_response(device_xml):
+    """Headers and body for a rendered description.xml"""
+    return build_xml_response(
+        device_xml,
+        "Access-Control-Allow-Origin: *\r\n"
+        "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+        "Access-Control-Allow-Headers: Content-Type, SOAPAction\r\n"
+        f"Server: {SERVER_AGENT}\r\n",
+    )
+
+
+def send_device_description(self):
+    """Send UPnP device description XML"""
+    # Rendered and encoded once by the server, not per request
+    device_xml = self.server_instance.get_device_description()
+    send_prebuilt_response(self, 200, _device_description_response(device_xml))
+
+
+# Basic SCPD for ContentDirectory - this should be expanded based on actual implemented actions
+CONTENT_DIRECTORY_SCPD = """<?xml version="1.0" encoding="utf-8"?>
 <scpd xmlns="urn:schemas-upnp-org:service-1-0">
 <specVersion>
     <major>1</major>
@@ -292,9 +375,10 @@ def send_scpd_xml(self, service_type):
         <dataType>string</dataType>
     </stateVariable>
 </serviceStateTable>
-</scpd>"""
-    elif service_type == "ConnectionManager":
-        scpd_xml = """<?xml version="1.0" encoding="utf-8"?>
+</scpd>""".encode()
+
+
+CONNECTION_MANAGER_SCPD = """<?xml version="1.0" encoding="utf-8"?>
 <scpd xmlns="urn:schemas-upnp-org:service-1-0">
 <specVersion>
     <major>1</major>
@@ -425,73 +509,83 @@ def send_scpd_xml(self, service_type):
         </allowedValueList>
     </stateVariable>
 </serviceStateTable>
-</scpd>"""
-    else:
-        self.send_error(404, "SCPD Not Found")
-        return
-
-    self.send_response(200)
-    self.send_header("Content-Type", "text/xml; charset=utf-8")
-    self.send_header("Content-Length", str(len(scpd_xml)))
-    self.send_header("Access-Control-Allow-Origin", "*")
-    self.send_header("Server", SERVER_AGENT)
-    self.end_headers()
-    self.wfile.write(scpd_xml.encode())
+</scpd>""".encode()
+
+# The SCPD documents are static, so they are encoded once at import
+SCPD_XML = {
+    "ContentDirectory": CONTENT_DIRECTORY_SCPD,
+    "ConnectionManager": CONNECTION_MANAGER_SCPD,
+}
+# ...and so are their complete responses, apart from the status line and Date
+SCPD_RESPONSES = {
+    service_type: build_xml_response(
+        scpd_xml, f"Access-Control-Allow-Origin: *\r\nServer: {SERVER_AGENT}\r\n"
+    )
+    for service_type, scpd_xml in SCPD_XML.items()
+}
 
 
-def handle_get_protocol_info(self):
-    """Handle ConnectionManager GetProtocolInfo requests"""
-    try:
-        print("Handling GetProtocolInfo request")
-
-        # Define supported protocols with expanded format support
-        source_protocols = [
-            # Video formats
-            "http-get:*:video/mp4:DLNA.ORG_PN=AVC_MP4_MP_SD_AAC_MULT5;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/x-msvideo:DLNA.ORG_PN=AVI;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/x-matroska:DLNA.ORG_PN=MATROSKA;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/quicktime:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/x-ms-wmv:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/x-flv:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/webm:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/x-m4v:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:video/3gpp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            # Audio formats
-            "http-get:*:audio/mpeg:DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/wav:DLNA.ORG_PN=LPCM;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/mp4:DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/x-m4a:DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/flac:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/ogg:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/x-ms-wma:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            "http-get:*:audio/aiff:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
-            # Image formats
-            "http-get:*:image/jpeg:DLNA.ORG_PN=JPEG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-            "http-get:*:image/png:DLNA.ORG_PN=PNG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-            "http-get:*:image/gif:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-            "http-get:*:image/bmp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-            "http-get:*:image/tiff:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-            "http-get:*:image/webp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
-        ]
-
-        source_info = ",".join(source_protocols)
-        sink_info = ""  # This server doesn't act as a sink
+def send_scpd_xml(self, service_type):
+    """Send Service Control Point Definition XML for the specified service type."""
+    response = SCPD_RESPONSES.get(service_type)
+    if response is None:
+        self.send_error(404, "SCPD Not Found")
+        return
 
-        response = f"""<?xml version="1.0" encoding="utf-8"?>
+    send_prebuilt_response(self, 200, response)
+
+
+# Protocols advertised by GetProtocolInfo; this server doesn't act as a sink
+SOURCE_PROTOCOLS = [
+    # Video formats
+    "http-get:*:video/mp4:DLNA.ORG_PN=AVC_MP4_MP_SD_AAC_MULT5;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/x-msvideo:DLNA.ORG_PN=AVI;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/x-matroska:DLNA.ORG_PN=MATROSKA;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/quicktime:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/x-ms-wmv:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/x-flv:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/webm:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/x-m4v:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:video/3gpp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    # Audio formats
+    "http-get:*:audio/mpeg:DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/wav:DLNA.ORG_PN=LPCM;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/mp4:DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/x-m4a:DLNA.ORG_PN=AAC_ISO_320;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/flac:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/ogg:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/x-ms-wma:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    "http-get:*:audio/aiff:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=01700000000000000000000000000000",
+    # Image formats
+    "http-get:*:image/jpeg:DLNA.ORG_PN=JPEG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+    "http-get:*:image/png:DLNA.ORG_PN=PNG_LRG;DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+    "http-get:*:image/gif:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+    "http-get:*:image/bmp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+    "http-get:*:image/tiff:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+    "http-get:*:image/webp:DLNA.ORG_OP=01;DLNA.ORG_FLAGS=00D00000000000000000000000000000",
+]
+SOURCE_PROTOCOL_INFO = ",".join(SOURCE_PROTOCOLS)
+
+PROTOCOL_INFO_RESPONSE = build_xml_response(
+    f"""<?xml version="1.0" encoding="utf-8"?>
 <s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
 <s:Body>
     <u:GetProtocolInfoResponse xmlns:u="urn:schemas-upnp-org:service:ConnectionManager:1">
-        <Source>{source_info}</Source>
-        <Sink>{sink_info}</Sink>
+        <Source>{SOURCE_PROTOCOL_INFO}</Source>
+        <Sink></Sink>
     </u:GetProtocolInfoResponse>
 </s:Body>
-</s:Envelope>"""
+</s:Envelope>""".encode()
+)
+
+
+def handle_get_protocol_info(self):
+    """Handle ConnectionManager GetProtocolInfo requests"""
+    try:
+        if self.verbose:
+            print("Handling GetProtocolInfo request")
 
-        self.send_response(200)
-        self.send_header("Content-Type", "text/xml; charset=utf-8")
-        self.send_header("Content-Length", str(len(response)))
-        self.end_headers()
-        self.wfile.write(response.encode())
+        send_prebuilt_response(self, 200, PROTOCOL_INFO_RESPONSE)
         if self.verbose:
             print("Sent GetProtocolInfo response")
 
@@ -137,7 +137,7 @@ class SSDPServer:
 
     def _send_search_response(self, addr, search_target="upnp:rootdevice"):
         """Send response to M-SEARCH request"""
-        location = f"http://{self.server_instance.server_ip}:{self.server_instance.port}/description.xml"
+        location = f"{self.server_instance.base_url}/description.xml"
         # Determine the appropriate ST and USN based on search target
         if search_target.lower() == "upnp:rootdevice":
             st = "upnp:rootdevice"
@@ -182,7 +182,7 @@ class SSDPServer:
 
     def _send_notify_alive(self):
         """Send NOTIFY alive messages"""
-        location = f"http://{self.server_instance.server_ip}:{self.server_instance.port}/description.xml"
+        location = f"{self.server_instance.base_url}/description.xml"
 
         messages = [
             # Root device
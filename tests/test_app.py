@@ -0,0 +1,84 @@
+"""Tests for change detection in the ZeroConfigDLNA content scan."""
+
+# pylint: disable=protected-access
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import app
+
+
+class UnlistableDirectoryTest(unittest.TestCase):
+    """An unreadable subdirectory must not force a full rescan on every check."""
+
+    def setUp(self):
+        self.media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_dir, ignore_errors=True)
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.locked_dir = os.path.join(self.media_dir, "locked")
+        os.makedirs(os.path.join(self.media_dir, "open"))
+        os.makedirs(self.locked_dir)
+        for name in ("a.mp4", os.path.join("open", "b.mp4")):
+            with open(os.path.join(self.media_dir, name), "wb"):
+                pass
+        with open(os.path.join(self.locked_dir, "c.mp4"), "wb"):
+            pass
+
+        # Backdate every directory so none of them is still settling
+        settled = time.time_ns() - 10 * app.MTIME_SETTLE_NS
+        for path in (self.media_dir, self.locked_dir):
+            os.utime(path, ns=(settled, settled))
+        os.utime(os.path.join(self.media_dir, "open"), ns=(settled, settled))
+
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Root can read any directory, so simulate EACCES instead of chmod
+        real_scandir = os.scandir
+
+        def scandir(path):
+            if self.locked and path == self.locked_dir:
+                raise PermissionError(errno.EACCES, "Permission denied", path)
+            return real_scandir(path)
+
+        self.locked = True
+        patcher = mock.patch("os.scandir", side_effect=scandir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _check(self, server):
+        # Skip the RESCAN_INTERVAL throttle so every call does the mtime walk
+        server._last_hash_check = 0
+        return server.has_content_changed()
+
+    def test_unchanged_tree_is_not_rescanned(self):
+        """Checks on an unchanged tree stop at the mtime walk."""
+        server = app.ZeroConfigDLNA(media_directory=self.media_dir)
+        self.assertIsNotNone(server.device_uuid)
+        self.assertEqual(server.media_count, 2)
+
+        with mock.patch.object(server, "_scan_once", wraps=server._scan_once) as scan:
+            for _ in range(3):
+                self.assertFalse(self._check(server))
+            scan.assert_not_called()
+
+    def test_permission_fix_triggers_rescan(self):
+        """A directory that becomes readable is picked up on the next check."""
+        server = app.ZeroConfigDLNA(media_directory=self.media_dir)
+        old_uuid = server.device_uuid
+
+        self.locked = False
+        self.assertTrue(self._check(server))
+        self.assertEqual(server.media_count, 3)
+        self.assertNotEqual(server.device_uuid, old_uuid)
+
+
+if __name__ == "__main__":
+    unittest.main()